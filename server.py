@@ -0,0 +1,229 @@
+"""ASGI front end for `app.handle_user_input`.
+
+Serve with any ASGI server, e.g. ``uvicorn server:app``.
+
+Endpoints:
+- POST /ask         body {"input": "..."} -> {"messages": [...], "coalesced": bool}
+- POST /ask/stream  same body; the messages are streamed as NDJSON lines
+- GET  /healthz     service counters
+
+Simultaneous requests whose input normalizes to the same text (case,
+whitespace and trailing punctuation are ignored) share one running
+orchestration instead of each starting their own. Each client (the
+``X-Client-Id`` header, else the peer address) may have at most
+ASK_MAX_CONCURRENT_PER_CLIENT requests in flight; extra requests get 429.
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from app import handle_user_input
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+def normalize_input(text: str) -> str:
+    """Key under which equivalent questions are coalesced."""
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ").lower()
+
+
+class AskService:
+    """ASGI application with in-flight coalescing and per-client limits."""
+
+    def __init__(self, handler: Callable[[str], Awaitable[List[str]]] = handle_user_input,
+                 max_per_client: int = None):
+        self.handler = handler
+        if max_per_client is None:
+            max_per_client = int(os.getenv("ASK_MAX_CONCURRENT_PER_CLIENT", "8"))
+        self.max_per_client = max_per_client
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._per_client: Dict[str, int] = {}
+        self.stats = {"requests": 0, "backend_runs": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+
+    async def ask(self, user_input: str) -> Tuple[List[str], bool]:
+        """Run (or join) the orchestration for `user_input`; returns (messages, coalesced)."""
+        key = normalize_input(user_input)
+        task = self._inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["backend_runs"] += 1
+            task = asyncio.ensure_future(self.handler(user_input))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting does not cancel the run for the others.
+        return await asyncio.shield(task), coalesced
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"].rstrip("/") or "/", scope["method"]
+        if path == "/healthz" and method == "GET":
+            return await _send_json(send, 200, dict(self.stats, inflight=len(self._inflight)))
+        if path not in ("/ask", "/ask/stream"):
+            return await _send_json(send, 404, {"error": "not found"})
+        if method != "POST":
+            return await _send_json(send, 405, {"error": "method not allowed"})
+
+        self.stats["requests"] += 1
+        client = _client_id(scope)
+        if self._per_client.get(client, 0) >= self.max_per_client:
+            self.stats["rejected"] += 1
+            return await _send_json(send, 429, {"error": f"too many concurrent requests (limit {self.max_per_client})"})
+
+        # Take the slot before the first await so concurrent requests see it.
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        try:
+            try:
+                body = json.loads(await _read_body(receive))
+                user_input = body["input"]
+                if not isinstance(user_input, str) or not user_input.strip():
+                    raise ValueError
+            except Exception:
+                return await _send_json(send, 400, {"error": 'expected a JSON body like {"input": "..."}'})
+
+            if path == "/ask/stream":
+                await self._stream(send, user_input)
+                return
+            try:
+                messages, coalesced = await self.ask(user_input)
+            except Exception as e:
+                self.stats["errors"] += 1
+                return await _send_json(send, 500, {"error": str(e)})
+            await _send_json(send, 200, {"messages": messages, "coalesced": coalesced})
+        finally:
+            self._per_client[client] -= 1
+            if not self._per_client[client]:
+                del self._per_client[client]
+
+    async def _stream(self, send, user_input: str):
+        # Headers go out immediately; lines follow as soon as the run completes.
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        try:
+            messages, coalesced = await self.ask(user_input)
+            for line in messages:
+                chunk = json.dumps({"message": line}) + "\n"
+                await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+            tail = {"done": True, "coalesced": coalesced}
+        except Exception as e:
+            self.stats["errors"] += 1
+            tail = {"done": True, "error": str(e)}
+        await send({"type": "http.response.body", "body": (json.dumps(tail) + "\n").encode("utf-8")})
+
+
+def _client_id(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == b"x-client-id":
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _read_body(receive) -> bytes:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status: int, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+app = AskService()
+
+
+if __name__ == "__main__":
+    # Local load test: 1,000 concurrent users hit the ASGI app in-process with
+    # a handful of questions phrased slightly differently. The backend is
+    # handle_user_input plus a simulated 200 ms pipeline run.
+    import random
+    import statistics
+    import time
+
+    USERS = 1000
+    QUESTIONS = ["Check CPU usage", "Any anomalies on vm-01?", "Optimize disk I/O", "Show memory pressure"]
+
+    async def slow_backend(user_input):
+        await asyncio.sleep(0.2)
+        return await handle_user_input(user_input)
+
+    async def call(service, client_id, text, path="/ask"):
+        body = json.dumps({"input": text}).encode("utf-8")
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": path,
+                 "headers": [(b"x-client-id", client_id.encode())], "client": ("127.0.0.1", 0)}
+        start = time.perf_counter()
+        await service(scope, receive, send)
+        return time.perf_counter() - start, sent[0]["status"]
+
+    def variant(rnd, text):
+        text = rnd.choice([text, text.lower(), text.upper(), f"  {text}  ", text + "?"])
+        return text.replace(" ", rnd.choice([" ", "  "]))
+
+    async def load_test():
+        rnd = random.Random(1)
+        service = AskService(handler=slow_backend, max_per_client=8)
+        # Users arrive over ~1 s in 5 waves, 200 clients with 5 users each.
+        jobs = []
+        for i in range(USERS):
+            async def user(i=i):
+                await asyncio.sleep((i % 5) * 0.25)
+                path = "/ask/stream" if i % 10 == 0 else "/ask"
+                return await call(service, f"client-{i % 200}", variant(rnd, rnd.choice(QUESTIONS)), path)
+            jobs.append(user())
+        start = time.perf_counter()
+        results = await asyncio.gather(*jobs)
+        wall = time.perf_counter() - start
+
+        latencies = sorted(lat for lat, status in results if status == 200)
+        statuses = {}
+        for _, status in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        p50 = statistics.median(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        stats = service.stats
+        print(f"{USERS} users in {wall:.2f}s, statuses {statuses}")
+        print(f"latency p50={p50 * 1e3:.1f}ms p99={p99 * 1e3:.1f}ms")
+        print(f"backend runs={stats['backend_runs']} coalesced={stats['coalesced']} "
+              f"(saved {stats['coalesced']} of {stats['requests']} runs)")
+
+    asyncio.run(load_test())
@@ -0,0 +1,260 @@
+"""Group co-occurring anomalies into incidents with a probable root resource.
+
+`AnomalyDetectorAgent` judges each metric in isolation, so when a shared
+dependency degrades the optimizer receives N independent findings and makes N
+recommendations. `CorrelationTracker` keeps a rolling window of every fleet
+series and, when findings arrive, computes lagged correlations between the
+anomalous series only. Strongly correlated findings are merged into one
+`Incident`; the member whose movements lead the others is the probable root.
+
+Keeping O(window) values per series and correlating only the anomalous subset
+keeps this tractable for thousands of series: the cost depends on how many
+series are anomalous at once, not on the square of the fleet. With numpy the
+k x k correlation matrix for each lag is a single matrix product; without it
+the same computation runs in pure Python.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+try:
+    from .payloads import MetricFinding
+except Exception:
+    from payloads import MetricFinding
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+class Incident(NamedTuple):
+    """Findings that share a probable root cause."""
+
+    root_resource: str
+    root_metric: str
+    findings: List[MetricFinding]
+
+    @property
+    def root(self) -> MetricFinding:
+        return next(f for f in self.findings if f.resource == self.root_resource and f.metric == self.root_metric)
+
+    @property
+    def resources(self) -> List[str]:
+        return sorted({f.resource for f in self.findings})
+
+
+def _zscores(window: Sequence[float]) -> List[float]:
+    n = len(window)
+    mean = sum(window) / n
+    sd = math.sqrt(sum((v - mean) ** 2 for v in window) / n)
+    return [(v - mean) / sd if sd > 0 else 0.0 for v in window]
+
+
+class CorrelationTracker:
+    """Rolling windows of fleet series and lagged-correlation grouping."""
+
+    def __init__(self, window: int = 60, max_lag: int = 5, min_corr: float = 0.7, min_points: int = 10):
+        if max_lag >= window:
+            raise ValueError("max_lag must be smaller than window")
+        self.window = window
+        self.max_lag = max_lag
+        self.min_corr = min_corr
+        self.min_points = min_points
+        self._series: Dict[Tuple[str, str], deque] = {}
+        # The pipeline observes from the detector stage and groups from the optimizer stage.
+        self._lock = threading.Lock()
+        self.stats = {"findings": 0, "incidents": 0}
+
+    def observe(self, values: Dict[Tuple[str, str], float]):
+        """Append one tick: {(resource, metric): value} for the fleet.
+
+        Series missing from a tick repeat their last value so windows stay aligned,
+        so every call is one tick: buffer a sweep that reads resources one at a
+        time and observe it once (see agent_pipeline.build_agent_pipeline).
+        """
+        with self._lock:
+            for key, value in values.items():
+                buf = self._series.get(key)
+                if buf is None:
+                    buf = self._series[key] = deque(maxlen=self.window)
+                buf.append(float(value))
+            for key, buf in self._series.items():
+                if key not in values and buf:
+                    buf.append(buf[-1])
+
+    def lagged_correlation(self, keys: Sequence[Tuple[str, str]]):
+        """Best |correlation| of changes and its lag for every pair of `keys`.
+
+        Returns (corr, lag) as k x k nested lists. lag[i][j] > 0 means series j
+        follows series i by that many ticks.
+        """
+        # Correlate tick-to-tick changes rather than levels: two series that both
+        # trend upward look correlated even when they are unrelated.
+        length = min(len(self._series[k]) for k in keys) - 1
+        k, max_lag = len(keys), min(self.max_lag, length - 1)
+        windows = []
+        for key in keys:
+            values = list(self._series[key])[-(length + 1):]
+            windows.append([b - a for a, b in zip(values, values[1:])])
+        best = [[0.0] * k for _ in range(k)]
+        lag_of = [[0] * k for _ in range(k)]
+
+        if NUMPY_AVAILABLE:
+            data = np.asarray(windows, dtype=float)
+            sd = data.std(axis=1, keepdims=True)
+            z = np.divide(data - data.mean(axis=1, keepdims=True), sd, out=np.zeros_like(data), where=sd > 0)
+            best_arr = np.zeros((k, k))
+            lag_arr = np.zeros((k, k), dtype=int)
+            for lag in range(-max_lag, max_lag + 1):
+                if lag >= 0:
+                    corr = z[:, :length - lag] @ z[:, lag:].T / (length - lag)
+                else:
+                    corr = z[:, -lag:] @ z[:, :length + lag].T / (length + lag)
+                better = np.abs(corr) > np.abs(best_arr)
+                best_arr = np.where(better, corr, best_arr)
+                lag_arr = np.where(better, lag, lag_arr)
+            return best_arr.tolist(), lag_arr.tolist()
+
+        z = [_zscores(w) for w in windows]
+        for i in range(k):
+            for j in range(i + 1, k):
+                for lag in range(-max_lag, max_lag + 1):
+                    if lag >= 0:
+                        pairs = zip(z[i][:length - lag], z[j][lag:])
+                        n = length - lag
+                    else:
+                        pairs = zip(z[i][-lag:], z[j][:length + lag])
+                        n = length + lag
+                    corr = sum(a * b for a, b in pairs) / n
+                    if abs(corr) > abs(best[i][j]):
+                        best[i][j] = best[j][i] = corr
+                        lag_of[i][j], lag_of[j][i] = lag, -lag
+        return best, lag_of
+
+    def group(self, findings: Sequence[MetricFinding]) -> List[Incident]:
+        """Merge correlated findings into incidents, each with a probable root."""
+        findings = list(findings)
+        k = len(findings)
+        parent = list(range(k))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        leads = [0] * k
+        with self._lock:
+            # Findings without enough history are only merged by resource below.
+            tracked = [i for i, f in enumerate(findings)
+                       if len(self._series.get((f.resource, f.metric), ())) > self.min_points]
+            if len(tracked) > 1:
+                corr, lag = self.lagged_correlation([(findings[i].resource, findings[i].metric) for i in tracked])
+                for a in range(len(tracked)):
+                    for b in range(a + 1, len(tracked)):
+                        if abs(corr[a][b]) >= self.min_corr:
+                            i, j = tracked[a], tracked[b]
+                            parent[find(i)] = find(j)
+                            if lag[a][b] > 0:
+                                leads[i] += 1
+                            elif lag[a][b] < 0:
+                                leads[j] += 1
+            self.stats["findings"] += k
+
+        # Two metrics of the same resource always belong to the same incident.
+        by_resource: Dict[str, int] = {}
+        for i, f in enumerate(findings):
+            if f.resource in by_resource:
+                parent[find(i)] = find(by_resource[f.resource])
+            else:
+                by_resource[f.resource] = i
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(k):
+            groups.setdefault(find(i), []).append(i)
+        incidents = []
+        for members in groups.values():
+            # Root: leads the most members; then earliest, then most severe.
+            root = max(members, key=lambda i: (leads[i], -findings[i].timestamp, findings[i].severity))
+            incidents.append(Incident(findings[root].resource, findings[root].metric, [findings[i] for i in members]))
+
+        self.stats["incidents"] += len(incidents)
+        return incidents
+
+
+if __name__ == "__main__":
+    # Synthetic cascading failure: a shared database VM degrades and 300 of
+    # 2,000 fleet VMs follow it 1-3 ticks later; 15 unrelated VMs have their
+    # own independent spikes at the same time. Compare the number of optimizer
+    # actions with and without grouping.
+    import random
+    import time
+
+    try:
+        from .payloads import Severity
+    except Exception:
+        from payloads import Severity
+
+    FLEET, DEPENDENTS, INDEPENDENT, TICKS = 2000, 300, 15, 60
+    rnd = random.Random(13)
+    vms = [f"vm-{i:04d}" for i in range(FLEET)]
+    dependents = {vm: rnd.randint(1, 3) for vm in rnd.sample(vms, DEPENDENTS)}
+    onset = {vm: rnd.randint(30, 55) for vm in rnd.sample([vm for vm in vms if vm not in dependents], INDEPENDENT)}
+
+    def db_cpu(t):
+        return 40 + (50 * (t - 40) / 20 if t >= 40 else 0) + 8 * math.sin(t / 3.0) + rnd.gauss(0, 1)
+
+    tracker = CorrelationTracker(window=TICKS, max_lag=5, min_corr=0.7)
+    history = []
+    start = time.perf_counter()
+    for t in range(TICKS):
+        history.append(db_cpu(t))
+        tick = {("db-01", "Percentage CPU"): history[-1]}
+        for vm in vms:
+            if vm in dependents:
+                value = 0.9 * history[max(0, t - dependents[vm])] + rnd.gauss(0, 1)
+            elif vm in onset and t >= onset[vm]:
+                value = 80 + rnd.uniform(0, 15)
+            else:
+                value = 35 + rnd.gauss(0, 5)
+            tick[(vm, "Percentage CPU")] = value
+        tracker.observe(tick)
+    observe_s = time.perf_counter() - start
+
+    now = time.time()
+    findings = [MetricFinding(r, m, buf[-1], now, Severity.WARNING)
+                for (r, m), buf in tracker._series.items() if buf[-1] > 75]
+    start = time.perf_counter()
+    incidents = tracker.group(findings)
+    group_s = time.perf_counter() - start
+
+    # Score against the simulation's ground truth: the DB and its dependents
+    # form one true incident; every other anomalous VM is its own incident.
+    def truth(resource):
+        return "db-01" if resource == "db-01" or resource in dependents else resource
+
+    labels_per_incident = [{truth(f.resource) for f in inc.findings} for inc in incidents]
+    expected = len({truth(f.resource) for f in findings})
+    wrong = [inc for inc, labels in zip(incidents, labels_per_incident) if len(labels) > 1]
+    incidents_per_label: Dict[str, int] = {}
+    for labels in labels_per_incident:
+        for label in labels:
+            incidents_per_label[label] = incidents_per_label.get(label, 0) + 1
+    split = sorted(label for label, n in incidents_per_label.items() if n > 1)
+    db_incidents = [inc for inc, labels in zip(incidents, labels_per_incident) if "db-01" in labels]
+
+    print(f"{FLEET + 1} series x {TICKS} ticks observed in {observe_s:.2f}s, numpy={'yes' if NUMPY_AVAILABLE else 'no'}")
+    print(f"{len(findings)} anomalous series grouped into {len(incidents)} incidents in {group_s * 1e3:.1f}ms "
+          f"(ground truth: {expected} incidents)")
+    print(f"correct groupings: {len(incidents) - len(wrong)}, wrong merges: {len(wrong)}, true incidents split: {len(split)}")
+    for inc in wrong:
+        print(f"  wrong merge: root={inc.root_resource} members={inc.resources}")
+    for inc in db_incidents:
+        print(f"  DB incident: root={inc.root_resource} ({len(inc.findings)} findings)")
+    print(f"optimizer actions: {len(findings)} without grouping, {len(incidents)} with grouping, "
+          f"{expected} ideal")
@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import timedelta
 from dotenv import load_dotenv, find_dotenv
 import urllib3
@@ -70,10 +71,41 @@ except Exception:
         def send_message(self, msg):
             print("Thread.send_message:", getattr(msg, "content", msg))
 
+try:
+    from .payloads import MetricFinding, Severity, encode_findings, render_findings
+    from .resilience import DEFAULT_CALLER, CircuitOpenError
+    from .model_router import BudgetExceeded, model_for_task
+except Exception:
+    from payloads import MetricFinding, Severity, encode_findings, render_findings
+    from resilience import DEFAULT_CALLER, CircuitOpenError
+    from model_router import BudgetExceeded, model_for_task
+
+
+def classify(metric_name: str, value: float):
+    """Return the Severity of a metric value, or None if it is not anomalous."""
+    if "CPU" in metric_name and value > 75:
+        return Severity.CRITICAL if value > 90 else Severity.WARNING
+    if "Memory" in metric_name and value < 1e9:
+        return Severity.CRITICAL if value < 2.5e8 else Severity.WARNING
+    if "Disk" in metric_name and value > 5e7:
+        return Severity.CRITICAL if value > 1e8 else Severity.WARNING
+    return None
+
+
 class AnomalyDetectorAgent(Agent):
-    def __init__(self):
+    def __init__(self, client=None, resilience=None, router=None):
+        """`client` replaces the MetricsQueryClient, e.g. with a replay backend.
+
+        `resilience` is the ResilientCaller guarding SDK calls; agents share
+        resilience.DEFAULT_CALLER unless one is given.
+
+        `router` (a ModelRouter) enables a model-written triage summary under
+        each alert, accounted to the request on the thread.
+        """
+        self.resilience = resilience or DEFAULT_CALLER
+        self.router = router
         self.name = "AnomalyDetectorAgent"
-        self.model = "gpt-35-turbo"
+        self.model = model_for_task("anomaly_detection")
         self.instructions = "Detect anomalies in Azure metrics like CPU, memory, and disk I/O."
         self.tools = []
 
@@ -82,12 +114,15 @@ class AnomalyDetectorAgent(Agent):
         except TypeError:
             super().__init__()
 
-        try:
-            from azure.identity import DefaultAzureCredential
-            self.client = MetricsQueryClient(credential=DefaultAzureCredential()) if MetricsQueryClient else None
-        except Exception:
-            self.client = None
-            print("Warning: could not instantiate MetricsQueryClient; metrics disabled.")
+        if client is not None:
+            self.client = client
+        else:
+            try:
+                from azure.identity import DefaultAzureCredential
+                self.client = MetricsQueryClient(credential=DefaultAzureCredential()) if MetricsQueryClient else None
+            except Exception:
+                self.client = None
+                print("Warning: could not instantiate MetricsQueryClient; metrics disabled.")
 
         subscription = os.getenv("AZURESUBSCRIPTIONID", "")
         rg = os.getenv("AZURERESOURCEGROUP", "")
@@ -130,17 +165,21 @@ class AnomalyDetectorAgent(Agent):
         if not self.client:
             return None
         try:
-            response = self.client.query(
+            response = self.resilience.call(
+                self.resource_id, "metrics.query", self.client.query,
                 resource_uri=self.resource_id,
                 metric_names=[metric_name],
                 timespan=timedelta(minutes=5),
-                aggregations=[MetricAggregationType.AVERAGE],
+                aggregations=[MetricAggregationType.AVERAGE if MetricAggregationType else "Average"],
             )
             for metric in getattr(response, "metrics", []):
                 for timeseries in getattr(metric, "timeseries", []):
                     for data in getattr(timeseries, "data", []):
                         if getattr(data, "average", None) is not None:
                             return data.average
+        except CircuitOpenError:
+            # Already reported when the underlying call failed; skip quietly until the cooldown ends.
+            return None
         except Exception as e:
             # Provide clearer message for authorization errors which are common when
             # DefaultAzureCredential is missing proper RBAC assignments on the target
@@ -152,25 +191,59 @@ class AnomalyDetectorAgent(Agent):
                 print(f"Error querying metric {metric_name}: {e}")
         return None
 
-    def run(self, thread, message):
+    def detect(self, observe=None):
+        """Check every configured metric and return the anomalous ones as findings.
+
+        `observe`, if given, receives every value read in this sweep as
+        {(resource, metric): value}. CorrelationTracker.observe treats each
+        call as a fleet tick, so when sweeping several agents collect their
+        values (e.g. with dict.update) and observe them once.
+        """
         print(f"Checking metrics: {self.metrics}")
-        anomalies = []
+        findings = []
+        values = {}
         for metric in self.metrics:
             value = self.get_latest_metric(metric)
             print(f"{metric}: {value}")
             if value is None:
                 continue
-            if (
-                ("CPU" in metric and value > 75)
-                or ("Memory" in metric and value < 1e9)
-                or ("Disk" in metric and value > 5e7)
-            ):
-                anomalies.append(f"{metric} = {value}")
-
-        if anomalies:
-            alert = "⚠️ Anomalies detected:\n" + "\n".join(anomalies)
+            values[(self.resource_id, metric)] = value
+            severity = classify(metric, value)
+            if severity is not None:
+                findings.append(MetricFinding(self.resource_id, metric, value, time.time(), severity))
+        if observe is not None:
+            observe(values)
+        return findings
+
+    def summarize(self, alert: str, request=None):
+        """One-line triage of `alert` from the model, or None without a router or budget."""
+        if self.router is None:
+            return None
+        prompt = [
+            {"role": "system", "content": self.instructions + " Summarize the alert in one sentence."},
+            {"role": "user", "content": alert},
+        ]
+        try:
+            return self.router.invoke(self.name, "summarize", "summary", prompt, max_tokens=80, request=request)
+        except BudgetExceeded as e:
+            print("Skipping alert summary:", e)
+        except Exception as e:
+            print("Alert summary failed:", e)
+        return None
+
+    def run(self, thread, message):
+        findings = self.detect()
+
+        if findings:
+            # The text is for display; downstream agents read the typed payload.
+            alert = render_findings(findings)
+            summary = self.summarize(alert, request=getattr(thread, "request", None))
+            if summary:
+                alert += f"\nSummary: {summary}"
             try:
-                thread.send_message(Message(content=alert, role="agent"))
+                msg = Message(content=alert, role="agent")
+                msg.payload = encode_findings(findings)
+                thread.send_message(msg)
             except Exception:
                 print(alert)
         else:
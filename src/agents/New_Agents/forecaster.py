@@ -0,0 +1,233 @@
+"""Fleet-wide short-horizon forecasting for predictive scaling.
+
+`ResourceOptimizer` only reacts once `AnomalyDetectorAgent` has seen a
+threshold breach. `FleetForecaster` fits an additive Holt-Winters model
+(level, trend and a seasonal profile, i.e. a seasonal EWMA) to every
+(resource, metric) series of the fleet at once, projects each series a few
+steps ahead with confidence bounds, and asks the optimizer what it would do at
+the projected values so a resize can start before users are affected.
+
+All series are updated together, one time step at a time, so the model state
+is a handful of fleet-wide arrays. With numpy installed each step is
+vectorized across the fleet; without it the same update runs per series in
+pure Python. New points are folded in incrementally with `update()`; there is
+no need to refit from scratch.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def _hw_step(y, level, trend, season, var, alpha, beta, gamma):
+    """One additive Holt-Winters update. Works on floats and on numpy arrays."""
+    err = y - (level + trend + season)
+    new_level = alpha * (y - season) + (1 - alpha) * (level + trend)
+    new_trend = beta * (new_level - level) + (1 - beta) * trend
+    new_season = gamma * (y - new_level) + (1 - gamma) * season
+    new_var = (1 - alpha) * var + alpha * err * err
+    return new_level, new_trend, new_season, new_var
+
+
+def _nanmean_or(data, default):
+    """Row means ignoring NaN; `default` for rows without any sample."""
+    seen = ~np.isnan(data)
+    counts = seen.sum(axis=1)
+    sums = np.where(seen, data, 0.0).sum(axis=1)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), default)
+
+
+class FleetForecaster:
+    """Holt-Winters forecaster over a fleet of aligned metric series.
+
+    `keys` names the series, typically (resource_id, metric_name). All series
+    must be sampled on the same cadence; missing samples may be passed as NaN
+    (or None without numpy) and leave that series' state unchanged.
+    """
+
+    def __init__(self, keys: Sequence[Tuple[str, str]], season_length: int = 288,
+                 alpha: float = 0.3, beta: float = 0.05, gamma: float = 0.1, z: float = 1.96):
+        if season_length < 1:
+            raise ValueError("season_length must be >= 1")
+        self.keys = list(keys)
+        self.season_length = season_length
+        self.alpha, self.beta, self.gamma, self.z = alpha, beta, gamma, z
+        self.observations = 0
+        self.level = self.trend = self.season = self.var = None
+
+    def fit(self, history):
+        """Fit from scratch on `history`, one row of values per series.
+
+        The first season initializes level, trend and seasonal profile; the
+        rest is folded in with `update()`. At least one full season is needed.
+        """
+        m = self.season_length
+        if len(history) != len(self.keys):
+            raise ValueError(f"history has {len(history)} series, expected {len(self.keys)}")
+        if NUMPY_AVAILABLE:
+            data = np.asarray(history, dtype=float)
+            if data.ndim != 2 or data.shape[1] < m:
+                raise ValueError(f"history needs at least one season ({m} points) per series")
+            first = data[:, :m]
+            # Same seeding as the pure-Python path: a season with no samples gives
+            # level 0 (and no trend) rather than NaN, so the series can recover.
+            self.level = _nanmean_or(first, 0.0)
+            if data.shape[1] >= 2 * m:
+                self.trend = (_nanmean_or(data[:, m:2 * m], self.level) - self.level) / m
+            else:
+                self.trend = np.zeros(len(self.keys))
+            self.season = np.nan_to_num(first - self.level[:, None])
+            self.var = _nanmean_or((first - self.level[:, None]) ** 2, 0.0)
+            columns = data[:, m:].T
+        else:
+            rows = [[float("nan") if v is None else float(v) for v in row] for row in history]
+            if any(len(row) < m for row in rows):
+                raise ValueError(f"history needs at least one season ({m} points) per series")
+            self.level, self.trend, self.season, self.var = [], [], [], []
+            for row in rows:
+                first = [v for v in row[:m] if not math.isnan(v)] or [0.0]
+                level = sum(first) / len(first)
+                trend = 0.0
+                if len(row) >= 2 * m:
+                    second = [v for v in row[m:2 * m] if not math.isnan(v)] or [level]
+                    trend = (sum(second) / len(second) - level) / m
+                self.level.append(level)
+                self.trend.append(trend)
+                self.season.append([0.0 if math.isnan(v) else v - level for v in row[:m]])
+                self.var.append(sum((v - level) ** 2 for v in first) / len(first))
+            columns = zip(*(row[m:] for row in rows))
+        self.observations = m
+        for column in columns:
+            self.update(column)
+        return self
+
+    def update(self, values):
+        """Fold in one new sample per series (in `keys` order)."""
+        if self.level is None:
+            raise RuntimeError("FleetForecaster.update() called before fit()")
+        slot = self.observations % self.season_length
+        a, b, g = self.alpha, self.beta, self.gamma
+        if NUMPY_AVAILABLE:
+            y = np.asarray(values, dtype=float)
+            level, trend, season, var = _hw_step(
+                y, self.level, self.trend, self.season[:, slot], self.var, a, b, g)
+            seen = ~np.isnan(y)
+            self.level = np.where(seen, level, self.level)
+            self.trend = np.where(seen, trend, self.trend)
+            self.season[:, slot] = np.where(seen, season, self.season[:, slot])
+            self.var = np.where(seen, var, self.var)
+        else:
+            for i, y in enumerate(values):
+                if y is None or math.isnan(y):
+                    continue
+                self.level[i], self.trend[i], self.season[i][slot], self.var[i] = _hw_step(
+                    float(y), self.level[i], self.trend[i], self.season[i][slot], self.var[i], a, b, g)
+        self.observations += 1
+
+    def forecast(self, horizon: int):
+        """Return (mean, lower, upper), each one row of `horizon` values per series."""
+        if self.level is None:
+            raise RuntimeError("FleetForecaster.forecast() called before fit()")
+        m, n = self.season_length, self.observations
+        steps = range(1, horizon + 1)
+        slots = [(n + k - 1) % m for k in steps]
+        if NUMPY_AVAILABLE:
+            k = np.arange(1, horizon + 1)
+            mean = self.level[:, None] + self.trend[:, None] * k + self.season[:, slots]
+            width = self.z * np.sqrt(self.var)[:, None] * np.sqrt(k)
+            return mean, mean - width, mean + width
+        mean, lower, upper = [], [], []
+        for i in range(len(self.keys)):
+            sd = math.sqrt(self.var[i])
+            row = [self.level[i] + self.trend[i] * k + self.season[i][s] for k, s in zip(steps, slots)]
+            width = [self.z * sd * math.sqrt(k) for k in steps]
+            mean.append(row)
+            lower.append([v - w for v, w in zip(row, width)])
+            upper.append([v + w for v, w in zip(row, width)])
+        return mean, lower, upper
+
+    def recommend(self, optimizer, horizon: int = 12, actions: Sequence[str] = ("recommend_resize",)) -> List[Dict]:
+        """Pre-emptive recommendations for series projected to need action.
+
+        `optimizer.recommend_action` (see ResourceOptimizer) is evaluated on the
+        projected values; the first step within `horizon` where it returns one
+        of `actions` yields a recommendation annotated with the step, forecast
+        value and confidence bounds.
+        """
+        mean, lower, upper = self.forecast(horizon)
+        recommendations = []
+        for i, (resource, metric) in enumerate(self.keys):
+            row = mean[i].tolist() if NUMPY_AVAILABLE else mean[i]
+            for k, value in enumerate(row):
+                rec = optimizer.recommend_action(metric, round(value, 2))
+                if rec.get("action") in actions:
+                    rec = dict(rec, resource=resource, metric=metric, preemptive=True, steps_ahead=k + 1,
+                               forecast=value, lower=float(lower[i][k]), upper=float(upper[i][k]))
+                    rec["reason"] = f"Forecast in {k + 1} steps: {rec['reason']}"
+                    recommendations.append(rec)
+                    break
+        return recommendations
+
+
+if __name__ == "__main__":
+    # Benchmark: fit + forecast for 10k series of one week at 5-minute resolution.
+    import random
+    import time
+
+    try:
+        from .resource_optimizer import ResourceOptimizer
+    except Exception:
+        from resource_optimizer import ResourceOptimizer
+
+    SERIES, DAYS, PER_DAY, HORIZON = 10_000, 7, 288, 12
+    points = DAYS * PER_DAY
+    print(f"{SERIES} series x {points} points, numpy={'yes' if NUMPY_AVAILABLE else 'no'}")
+
+    rnd = random.Random(3)
+    keys = [(f"vm-{i // 2:05d}", "Percentage CPU" if i % 2 == 0 else "Available Memory Bytes") for i in range(SERIES)]
+    start = time.perf_counter()
+    if NUMPY_AVAILABLE:
+        rng = np.random.default_rng(3)
+        t = np.arange(points)
+        base = rng.uniform(20, 65, size=(SERIES, 1))
+        history = base + 15 * np.sin(2 * np.pi * t / PER_DAY + rng.uniform(0, 6, size=(SERIES, 1)))
+        history += t * rng.uniform(0, 0.004, size=(SERIES, 1)) + rng.normal(0, 3, size=(SERIES, points))
+        history[1::2] = history[1::2] * 1e8  # memory series in bytes
+    else:
+        history = []
+        for i in range(SERIES):
+            b, phase = rnd.uniform(20, 65), rnd.uniform(0, 6)
+            scale = 1e8 if i % 2 else 1.0
+            history.append([scale * (b + 15 * math.sin(2 * math.pi * k / PER_DAY + phase) + rnd.gauss(0, 3)) for k in range(points)])
+    print(f"generated history in {time.perf_counter() - start:.2f}s")
+
+    forecaster = FleetForecaster(keys, season_length=PER_DAY)
+    start = time.perf_counter()
+    forecaster.fit(history)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecaster.forecast(HORIZON)
+    forecast_s = time.perf_counter() - start
+
+    latest = [row[-1] for row in history]
+    start = time.perf_counter()
+    forecaster.update(latest)
+    update_s = time.perf_counter() - start
+
+    optimizer = ResourceOptimizer(dry_run=True)
+    start = time.perf_counter()
+    recs = forecaster.recommend(optimizer, horizon=HORIZON)
+    recommend_s = time.perf_counter() - start
+
+    print(f"fit {fit_s:.2f}s, forecast({HORIZON}) {forecast_s * 1e3:.1f}ms, "
+          f"incremental update {update_s * 1e3:.2f}ms, recommend {recommend_s:.2f}s")
+    print(f"{len(recs)} pre-emptive recommendations")
+    for rec in recs[:3]:
+        print(f"  {rec['resource']} {rec['metric']}: {rec['reason']} [{rec['lower']:.1f}, {rec['upper']:.1f}]")
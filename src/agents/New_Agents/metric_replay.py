@@ -0,0 +1,426 @@
+"""Record and replay Azure metric and compute traffic.
+
+Load-testing the agents normally requires live Azure calls. This module
+captures real `MetricsQueryClient` and `ComputeManagementClient` responses
+into a compact columnar file and replays them through drop-in clients:
+
+    recording = Recording()
+    metrics = MetricRecorder(MetricsQueryClient(credential), recording)
+    compute = ComputeRecorder(ComputeManagementClient(credential, sub), recording)
+    ...  # run the agents with client=metrics / client=compute
+    recording.save("fleet.afr")
+
+    replay = ReplayMetricsClient(Recording.load("fleet.afr"), speed=100, fleet_multiplier=100)
+    agent = AnomalyDetectorAgent(client=replay)
+
+Replay options:
+- speed: 1.0 replays in real time, 100.0 a hundred times faster, None as fast
+  as possible (the virtual clock only moves when `clock.advance()` is called).
+- time_warp: shift returned timestamps so the recording appears to be
+  happening now instead of when it was captured.
+- fleet_multiplier: every recorded resource appears that many times. Clones
+  are named ``<id>-rNNNN`` and read the series at a per-clone phase offset,
+  so 50 recorded VMs become 5,000 distinct-looking VMs.
+
+The replay loops when the virtual clock runs past the end of the recording.
+
+File format: magic line, a length-prefixed JSON header (row count, string
+table, column layout, compute snapshots), then one zlib-compressed column per
+field: resource index and metric index (uint32), timestamp and value (float64).
+"""
+
+import bisect
+import json
+import struct
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+MAGIC = b"AFREC1\n"
+_HEADER_LEN = struct.Struct("<I")
+_COLUMNS = (("resource", "I"), ("metric", "I"), ("timestamp", "d"), ("value", "d"))
+_CLONE_PHASE_STEP = 7919.0  # seconds; a prime so clone offsets rarely line up
+
+
+def _epoch(ts) -> float:
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp()
+    return float(ts)
+
+
+class Recording:
+    """Columnar store of metric points plus the last-seen state of each VM."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+        self.columns = {name: array(code) for name, code in _COLUMNS}
+        self.compute: Dict[str, dict] = {}
+
+    def __len__(self):
+        return len(self.columns["timestamp"])
+
+    def _intern(self, s: str) -> int:
+        idx = self._string_index.get(s)
+        if idx is None:
+            idx = self._string_index[s] = len(self.strings)
+            self.strings.append(s)
+        return idx
+
+    def add_point(self, resource: str, metric: str, timestamp, value: float):
+        self.columns["resource"].append(self._intern(resource))
+        self.columns["metric"].append(self._intern(metric))
+        self.columns["timestamp"].append(_epoch(timestamp))
+        self.columns["value"].append(float(value))
+
+    def add_vm(self, rg: str, name: str, **fields):
+        self.compute.setdefault(f"{rg}/{name}", {"rg": rg, "name": name}).update(fields)
+
+    def save(self, path: str):
+        blobs = [zlib.compress(self.columns[name].tobytes(), 6) for name, _ in _COLUMNS]
+        header = {
+            "rows": len(self),
+            "strings": self.strings,
+            "columns": [{"name": name, "type": code, "nbytes": len(blob)} for (name, code), blob in zip(_COLUMNS, blobs)],
+            "compute": self.compute,
+        }
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        with open(path, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(_HEADER_LEN.pack(len(raw)))
+            fh.write(raw)
+            for blob in blobs:
+                fh.write(blob)
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path, "rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a metric recording")
+            (length,) = _HEADER_LEN.unpack(fh.read(_HEADER_LEN.size))
+            header = json.loads(fh.read(length))
+            rec = cls()
+            rec.strings = header["strings"]
+            rec._string_index = {s: i for i, s in enumerate(rec.strings)}
+            rec.compute = header.get("compute", {})
+            for col in header["columns"]:
+                data = array(col["type"])
+                data.frombytes(zlib.decompress(fh.read(col["nbytes"])))
+                if len(data) != header["rows"]:
+                    raise ValueError(f"{path}: column {col['name']} has {len(data)} rows, expected {header['rows']}")
+                rec.columns[col["name"]] = data
+        return rec
+
+    def series(self) -> Dict[Tuple[str, str], Tuple[array, array]]:
+        """Return {(resource, metric): (timestamps, values)} sorted by time."""
+        grouped: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+        cols = self.columns
+        for r, m, ts, v in zip(cols["resource"], cols["metric"], cols["timestamp"], cols["value"]):
+            grouped.setdefault((r, m), []).append((ts, v))
+        out = {}
+        for (r, m), points in grouped.items():
+            points.sort()
+            out[(self.strings[r], self.strings[m])] = (array("d", (p[0] for p in points)), array("d", (p[1] for p in points)))
+        return out
+
+
+class MetricRecorder:
+    """Wraps a MetricsQueryClient and records every data point it returns."""
+
+    def __init__(self, client, recording: Optional[Recording] = None):
+        self.client = client
+        self.recording = recording if recording is not None else Recording()
+
+    def query(self, resource_uri, metric_names, **kwargs):
+        response = self.client.query(resource_uri=resource_uri, metric_names=metric_names, **kwargs)
+        for metric in getattr(response, "metrics", []):
+            name = getattr(metric, "name", None) or metric_names[0]
+            for timeseries in getattr(metric, "timeseries", []):
+                for data in getattr(timeseries, "data", []):
+                    if getattr(data, "average", None) is not None:
+                        self.recording.add_point(resource_uri, name, data.timestamp, data.average)
+        return response
+
+
+class _RecordingVirtualMachines:
+    def __init__(self, operations, recording: Recording):
+        self._ops = operations
+        self._recording = recording
+
+    def get(self, rg, name, *args, **kwargs):
+        vm = self._ops.get(rg, name, *args, **kwargs)
+        hardware_profile = getattr(vm, "hardware_profile", None)
+        storage_profile = getattr(vm, "storage_profile", None)
+        os_disk = getattr(storage_profile, "os_disk", None)
+        self._recording.add_vm(
+            rg, name,
+            vm_size=getattr(hardware_profile, "vm_size", None),
+            os_disk_size_gb=getattr(os_disk, "disk_size_gb", None),
+        )
+        return vm
+
+    def instance_view(self, rg, name, *args, **kwargs):
+        iv = self._ops.instance_view(rg, name, *args, **kwargs)
+        self._recording.add_vm(rg, name, statuses=[s.code for s in getattr(iv, "statuses", []) if s.code])
+        return iv
+
+    def __getattr__(self, item):
+        return getattr(self._ops, item)
+
+
+class ComputeRecorder:
+    """Wraps a ComputeManagementClient and records VM shape and power state."""
+
+    def __init__(self, client, recording: Optional[Recording] = None):
+        self.client = client
+        self.recording = recording if recording is not None else Recording()
+        self.virtual_machines = _RecordingVirtualMachines(client.virtual_machines, self.recording)
+
+
+class ReplayClock:
+    """Virtual clock over the recording's time range.
+
+    With a speed, virtual time advances with the wall clock multiplied by it.
+    With speed=None it only moves when `advance()` is called.
+    """
+
+    def __init__(self, start: float, speed: Optional[float] = 1.0):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive, or None for as fast as possible")
+        self.start = start
+        self.speed = speed
+        self._wall0 = time.monotonic()
+        self._now = start
+
+    def now(self) -> float:
+        if self.speed is None:
+            return self._now
+        return self.start + (time.monotonic() - self._wall0) * self.speed
+
+    def advance(self, seconds: float):
+        if self.speed is not None:
+            raise RuntimeError("advance() is only valid for an as-fast-as-possible clock (speed=None)")
+        self._now += seconds
+
+
+def _clone_name(base: str, i: int) -> str:
+    return base if i == 0 else f"{base}-r{i:04d}"
+
+
+class ReplayMetricsClient:
+    """Drop-in replacement for MetricsQueryClient backed by a Recording."""
+
+    def __init__(self, recording: Recording, speed: Optional[float] = 1.0, time_warp: bool = False,
+                 fleet_multiplier: int = 1, default_timespan: timedelta = timedelta(minutes=5)):
+        if fleet_multiplier < 1:
+            raise ValueError("fleet_multiplier must be >= 1")
+        self._series = recording.series()
+        if not self._series:
+            raise ValueError("Recording contains no metric points")
+        self.start = min(ts[0] for ts, _ in self._series.values())
+        self.end = max(ts[-1] for ts, _ in self._series.values())
+        # Treat the recording as periodic with one trailing sample interval so it loops cleanly.
+        first_ts = next(iter(self._series.values()))[0]
+        step = (first_ts[-1] - first_ts[0]) / (len(first_ts) - 1) if len(first_ts) > 1 else 60.0
+        self.duration = (self.end - self.start) + step
+        self.clock = ReplayClock(self.start, speed)
+        self.warp = (time.time() - self.start) if time_warp else 0.0
+        self.default_timespan = default_timespan
+        self.queries = 0
+
+        self._fleet: Dict[str, Tuple[str, float]] = {}
+        for resource in {r for r, _ in self._series}:
+            for i in range(fleet_multiplier):
+                self._fleet[_clone_name(resource, i)] = (resource, (i * _CLONE_PHASE_STEP) % self.duration)
+
+    def resources(self) -> List[str]:
+        return sorted(self._fleet)
+
+    def metric_names(self) -> List[str]:
+        return sorted({m for _, m in self._series})
+
+    def _window(self, key, lo: float, hi: float, offset: float):
+        """Points of `key` for virtual window [lo, hi], wrapping around the recording."""
+        timestamps, values = self._series[key]
+        period_end = self.start + self.duration
+        out = []
+        # One segment per pass through the recording; a span longer than the
+        # recording loops over it as often as needed.
+        a = lo
+        while True:
+            base_a = self.start + (a - offset - self.start) % self.duration
+            if base_a >= period_end:  # float rounding at the wrap point
+                base_a = self.start
+            b = min(hi, a + (period_end - base_a))
+            i = bisect.bisect_left(timestamps, base_a)
+            j = bisect.bisect_right(timestamps, base_a + (b - a))
+            out.extend((a + (timestamps[k] - base_a), values[k]) for k in range(i, j))
+            if b >= hi:
+                return out
+            a = b
+
+    def query(self, resource_uri, metric_names, timespan=None, aggregations=None, **kwargs):
+        self.queries += 1
+        if resource_uri not in self._fleet:
+            raise LookupError(f"ResourceNotFound: {resource_uri} is not in the replay fleet")
+        base, offset = self._fleet[resource_uri]
+        if isinstance(timespan, tuple):
+            # (start, end) or (start, duration), as accepted by MetricsQueryClient
+            lo = _epoch(timespan[0]) - self.warp
+            end = timespan[1]
+            hi = lo + end.total_seconds() if isinstance(end, timedelta) else _epoch(end) - self.warp
+        else:
+            hi = self.clock.now()
+            lo = hi - (timespan or self.default_timespan).total_seconds()
+
+        metrics = []
+        for name in metric_names:
+            key = (base, name)
+            points = self._window(key, lo, hi, offset) if key in self._series else []
+            data = [
+                SimpleNamespace(timestamp=datetime.fromtimestamp(t + self.warp, tz=timezone.utc), average=v)
+                for t, v in points
+            ]
+            metrics.append(SimpleNamespace(name=name, timeseries=[SimpleNamespace(data=data)]))
+        return SimpleNamespace(metrics=metrics, timespan=timespan)
+
+
+class _NoopPoller:
+    def wait(self, *args, **kwargs):
+        return None
+
+    def result(self, *args, **kwargs):
+        return None
+
+
+class _ReplayVirtualMachines:
+    def __init__(self, vms: Dict[str, dict]):
+        self._vms = vms
+
+    def _lookup(self, rg, name):
+        vm = self._vms.get(f"{rg}/{name}")
+        if vm is None:
+            raise LookupError(f"ResourceNotFound: virtual machine {rg}/{name} is not in the replay fleet")
+        return vm
+
+    def get(self, rg, name, *args, **kwargs):
+        vm = self._lookup(rg, name)
+        return SimpleNamespace(
+            name=name,
+            hardware_profile=SimpleNamespace(vm_size=vm.get("vm_size")),
+            storage_profile=SimpleNamespace(os_disk=SimpleNamespace(disk_size_gb=vm.get("os_disk_size_gb"))),
+        )
+
+    def instance_view(self, rg, name, *args, **kwargs):
+        vm = self._lookup(rg, name)
+        return SimpleNamespace(statuses=[SimpleNamespace(code=c) for c in vm.get("statuses", [])])
+
+    def begin_restart(self, rg, name, *args, **kwargs):
+        self._lookup(rg, name)
+        return _NoopPoller()
+
+    def begin_create_or_update(self, rg, name, parameters, *args, **kwargs):
+        vm = self._lookup(rg, name)
+        size = getattr(getattr(parameters, "hardware_profile", None), "vm_size", None)
+        if size:
+            vm["vm_size"] = size
+        return _NoopPoller()
+
+
+class ReplayComputeClient:
+    """Drop-in replacement for ComputeManagementClient backed by a Recording."""
+
+    def __init__(self, recording: Recording, fleet_multiplier: int = 1):
+        vms = {}
+        for snapshot in recording.compute.values():
+            for i in range(fleet_multiplier):
+                name = _clone_name(snapshot["name"], i)
+                vms[f"{snapshot['rg']}/{name}"] = dict(snapshot, name=name)
+        self.virtual_machines = _ReplayVirtualMachines(vms)
+
+
+def synthesize(vms: int = 50, minutes: int = 60, interval: int = 60, rg: str = "rg-replay",
+               subscription: str = "00000000-0000-0000-0000-000000000000", seed: int = 7) -> Recording:
+    """Build a synthetic recording shaped like real VM metric traffic."""
+    import math
+    import random
+
+    rnd = random.Random(seed)
+    rec = Recording()
+    start = time.time() - minutes * 60
+    for n in range(vms):
+        name = f"vm-{n:03d}"
+        rid = f"/subscriptions/{subscription}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines/{name}"
+        base_cpu = rnd.uniform(20, 70)
+        for k in range(0, minutes * 60, interval):
+            ts = start + k
+            wave = math.sin(2 * math.pi * k / 1800.0 + n)
+            rec.add_point(rid, "Percentage CPU", ts, max(0.0, min(100.0, base_cpu + 15 * wave + rnd.gauss(0, 5))))
+            rec.add_point(rid, "Available Memory Bytes", ts, max(1e8, 4e9 - 2.5e9 * max(0.0, wave) + rnd.gauss(0, 2e8)))
+            rec.add_point(rid, "Disk Read Bytes", ts, max(0.0, 2e7 + 3e7 * wave + rnd.gauss(0, 1e7)))
+        rec.add_vm(rg, name, vm_size="Standard_D4s_v3", os_disk_size_gb=128, statuses=["PowerState/running"])
+    return rec
+
+
+if __name__ == "__main__":
+    # Replay a recording against the anomaly detector and report where the
+    # sweep rate saturates:
+    #   python metric_replay.py synth fleet.afr --vms 50 --minutes 60
+    #   python metric_replay.py replay fleet.afr --fleet 100 --speed max
+    import argparse
+    import contextlib
+    import io
+    import os
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_synth = sub.add_parser("synth", help="write a synthetic recording")
+    p_synth.add_argument("path")
+    p_synth.add_argument("--vms", type=int, default=50)
+    p_synth.add_argument("--minutes", type=int, default=60)
+    p_synth.add_argument("--interval", type=int, default=60)
+    p_replay = sub.add_parser("replay", help="sweep a replayed fleet with AnomalyDetectorAgent")
+    p_replay.add_argument("path")
+    p_replay.add_argument("--fleet", type=int, default=1, help="fleet multiplier")
+    p_replay.add_argument("--speed", default="max", help="1, 100, ... or 'max'")
+    p_replay.add_argument("--sweeps", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.cmd == "synth":
+        rec = synthesize(args.vms, args.minutes, args.interval)
+        rec.save(args.path)
+        print(f"Wrote {len(rec)} points ({os.path.getsize(args.path)} bytes) to {args.path}")
+    else:
+        try:
+            from .anomaly_detector import AnomalyDetectorAgent
+        except Exception:
+            from anomaly_detector import AnomalyDetectorAgent
+
+        rec = Recording.load(args.path)
+        speed = None if args.speed == "max" else float(args.speed)
+        replay = ReplayMetricsClient(rec, speed=speed, fleet_multiplier=args.fleet)
+        resources = replay.resources()
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = AnomalyDetectorAgent(client=replay)
+        agent.metrics = replay.metric_names()
+        interval = replay.duration / max(1, min(len(ts) for ts, _ in replay._series.values()))
+        print(f"Replaying {len(resources)} VMs x {len(agent.metrics)} metrics, sample interval {interval:.0f}s, speed={args.speed}")
+
+        for sweep in range(args.sweeps):
+            findings = 0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for rid in resources:
+                    agent.resource_id = rid
+                    findings += len(agent.detect())
+            elapsed = time.perf_counter() - start
+            # A sweep has to finish within one (sped-up) sample interval to keep up.
+            print(f"sweep {sweep}: {elapsed:.2f}s, {len(resources) * len(agent.metrics) / elapsed:,.0f} queries/s, "
+                  f"{findings} findings, keeps up to {interval / elapsed:,.0f}x real time")
+            if speed is None:
+                replay.clock.advance(interval)
@@ -0,0 +1,242 @@
+"""Model invocation layer with token accounting, tier routing and budgets.
+
+Every agent used to be pinned to gpt-35-turbo regardless of the task, and
+nothing recorded how many tokens a request spent. `ModelRouter.invoke()`
+sits between the agents and the model endpoint:
+
+- each call is routed to a model tier by task type (cheap/fast tier for
+  routing and classification, a stronger tier for root-cause analysis) and
+  steps down a tier when the request or the minute budget is running low;
+- prompt and completion tokens are counted per request, agent and step, with
+  the endpoint's reported usage when available and the local tokenizer
+  otherwise;
+- per-request and per-minute token budgets are enforced before each call;
+  `BudgetExceeded` says which one ran out.
+
+An orchestrator with a `router` attribute starts one `RequestBudget` per turn
+in `orchestratedynamic` and puts it on the thread as `thread.request`. Agents
+given the same router (e.g. `AnomalyDetectorAgent(router=...)`) charge their
+calls to it.
+
+Deployment names per tier come from MODEL_TIER_SMALL, MODEL_TIER_STANDARD
+and MODEL_TIER_LARGE. `FakeModelEndpoint` reports usage like the real service
+and is used by test_model_router.py and test_real_agents_runner.py.
+"""
+
+import os
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    from .thread_compaction import count_tokens
+except Exception:
+    from thread_compaction import count_tokens
+
+# Chat formatting overhead per message, as in the OpenAI token counting guide.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+class ModelTier(NamedTuple):
+    deployment: str
+    prompt_cost_per_1k: float
+    completion_cost_per_1k: float
+
+
+# Cheapest first; routing steps down this list when budgets run low.
+TIER_ORDER = ("small", "standard", "large")
+DEFAULT_TIERS: Dict[str, ModelTier] = {
+    "small": ModelTier(os.getenv("MODEL_TIER_SMALL", "gpt-4o-mini"), 0.00015, 0.0006),
+    "standard": ModelTier(os.getenv("MODEL_TIER_STANDARD", "gpt-35-turbo"), 0.0005, 0.0015),
+    "large": ModelTier(os.getenv("MODEL_TIER_LARGE", "gpt-4o"), 0.0025, 0.01),
+}
+TASK_TIERS: Dict[str, str] = {
+    "routing": "small",
+    "classification": "small",
+    "anomaly_detection": "standard",
+    "optimization": "standard",
+    "summary": "standard",
+    "root_cause": "large",
+}
+
+
+def model_for_task(task: str) -> str:
+    """Deployment name for `task` when budgets are not a concern."""
+    return DEFAULT_TIERS[TASK_TIERS.get(task, "standard")].deployment
+
+
+def count_message_tokens(messages: Sequence[Dict[str, str]]) -> int:
+    """Prompt tokens for a chat request."""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in messages) + TOKENS_PER_REPLY
+
+
+def _as_chat(messages) -> List[Dict[str, str]]:
+    out = []
+    for m in messages:
+        if isinstance(m, dict):
+            out.append({"role": m.get("role", "user"), "content": m.get("content", "")})
+        elif isinstance(m, str):
+            out.append({"role": "user", "content": m})
+        else:
+            out.append({"role": getattr(m, "role", None) or "user", "content": getattr(m, "content", "") or ""})
+    return out
+
+
+class BudgetExceeded(Exception):
+    """A call would exceed the per-request or per-minute token budget."""
+
+    def __init__(self, scope: str, needed: int, remaining: int, retry_after: float = 0.0):
+        super().__init__(f"{scope} token budget exceeded: needs {needed}, {remaining} remaining")
+        self.scope = scope
+        self.needed = needed
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+class RequestBudget:
+    """Token budget and spend for one user request."""
+
+    def __init__(self, request_id: str, max_tokens: int):
+        self.request_id = request_id
+        self.max_tokens = max_tokens
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.max_tokens - self.used
+
+
+class FakeModelEndpoint:
+    """Model endpoint stand-in that replies with canned text and reports usage."""
+
+    def __init__(self, reply="ok"):
+        self.reply = reply
+        self.calls = []
+
+    def complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int):
+        content = self.reply(model, messages) if callable(self.reply) else self.reply
+        words = content.split()
+        while words and count_tokens(" ".join(words)) > max_tokens:
+            words.pop()
+        if len(words) < len(content.split()):
+            content = " ".join(words)
+        completion = count_tokens(content)
+        self.calls.append({"model": model, "messages": messages, "max_tokens": max_tokens})
+        usage = SimpleNamespace(prompt_tokens=count_message_tokens(messages), completion_tokens=completion)
+        return SimpleNamespace(content=content, usage=usage, model=model)
+
+
+class ChatCompletionsEndpoint:
+    """Adapter for an (Azure) OpenAI client exposing chat.completions.create()."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int):
+        resp = self.client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens)
+        return SimpleNamespace(content=resp.choices[0].message.content, usage=getattr(resp, "usage", None), model=model)
+
+
+class ModelRouter:
+    """Routes agent model calls to tiers and accounts for their tokens."""
+
+    def __init__(self, endpoint, request_budget: int = 8000, minute_budget: int = 120_000,
+                 downgrade_at: float = 0.8, tiers: Optional[Dict[str, ModelTier]] = None,
+                 task_tiers: Optional[Dict[str, str]] = None, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.request_budget = request_budget
+        self.minute_budget = minute_budget
+        self.downgrade_at = downgrade_at
+        self.tiers = tiers or DEFAULT_TIERS
+        self.task_tiers = task_tiers or TASK_TIERS
+        self.clock = clock
+        self._window: deque = deque()  # (time, tokens) spent in the last minute
+        self._minute_used = 0
+        self.ledger: List[Dict[str, Any]] = []
+
+    def start_request(self, request_id: Optional[str] = None, max_tokens: Optional[int] = None) -> RequestBudget:
+        return RequestBudget(request_id or uuid.uuid4().hex, max_tokens or self.request_budget)
+
+    def minute_used(self) -> int:
+        cutoff = self.clock() - 60.0
+        while self._window and self._window[0][0] <= cutoff:
+            self._minute_used -= self._window.popleft()[1]
+        return self._minute_used
+
+    def choose_tier(self, task: str, request: Optional[RequestBudget] = None) -> str:
+        """Tier for `task`, one step cheaper when either budget is mostly spent."""
+        tier = self.task_tiers.get(task, "standard")
+        pressure = self.minute_used() / self.minute_budget
+        if request is not None:
+            pressure = max(pressure, request.used / request.max_tokens)
+        if pressure >= self.downgrade_at:
+            tier = TIER_ORDER[max(0, TIER_ORDER.index(tier) - 1)]
+        return tier
+
+    def invoke(self, agent: str, step: str, task: str, messages, max_tokens: int = 256,
+               request: Optional[RequestBudget] = None) -> str:
+        """Call the model for `agent`/`step` and return the reply text."""
+        chat = _as_chat(messages)
+        prompt_estimate = count_message_tokens(chat)
+        tier = self.choose_tier(task, request)
+
+        if request is not None:
+            # Shrink the completion to what is left of the request budget rather than fail outright.
+            max_tokens = min(max_tokens, request.remaining - prompt_estimate)
+            if max_tokens <= 0:
+                raise BudgetExceeded("request", prompt_estimate + 1, request.remaining)
+        minute_remaining = self.minute_budget - self.minute_used()
+        if prompt_estimate + max_tokens > minute_remaining:
+            retry_after = 60.0 - (self.clock() - self._window[0][0]) if self._window else 0.0
+            raise BudgetExceeded("minute", prompt_estimate + max_tokens, minute_remaining, retry_after)
+
+        deployment = self.tiers[tier].deployment
+        start = self.clock()
+        resp = self.endpoint.complete(model=deployment, messages=chat, max_tokens=max_tokens)
+        latency = self.clock() - start
+        content = getattr(resp, "content", "") or ""
+
+        usage = getattr(resp, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        reported = prompt_tokens is not None and completion_tokens is not None
+        if not reported:
+            prompt_tokens, completion_tokens = prompt_estimate, count_tokens(content)
+        total = prompt_tokens + completion_tokens
+
+        self._window.append((self.clock(), total))
+        self._minute_used += total
+        if request is not None:
+            request.used += total
+        cost = (prompt_tokens * self.tiers[tier].prompt_cost_per_1k
+                + completion_tokens * self.tiers[tier].completion_cost_per_1k) / 1000
+        self.ledger.append({
+            "request_id": request.request_id if request is not None else None,
+            "agent": agent,
+            "step": step,
+            "task": task,
+            "tier": tier,
+            "model": deployment,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prompt_estimate": prompt_estimate,
+            "usage_reported": reported,
+            "cost": cost,
+            "latency_s": latency,
+        })
+        return content
+
+    def usage(self, by: Sequence[str] = ("request_id", "agent", "step")) -> Dict[tuple, Dict[str, float]]:
+        """Token and cost totals grouped by ledger fields."""
+        totals: Dict[tuple, Dict[str, float]] = {}
+        for entry in self.ledger:
+            key = tuple(entry[f] for f in by)
+            t = totals.setdefault(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+            t["calls"] += 1
+            t["prompt_tokens"] += entry["prompt_tokens"]
+            t["completion_tokens"] += entry["completion_tokens"]
+            t["cost"] += entry["cost"]
+        return totals
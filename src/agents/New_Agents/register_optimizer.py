@@ -103,10 +103,16 @@ except Exception:
         def __init__(self):
             pass
 
+try:
+    from model_router import model_for_task
+except Exception:
+    def model_for_task(task):
+        return "gpt-35-turbo"
+
 class ResourceOptimizerAgent:
     def __init__(self):
         self.name = "ResourceOptimizerAgent"
-        self.model = "gpt-35-turbo"
+        self.model = model_for_task("optimization")
         self.instructions = "Monitor VM metrics and recommend or apply resource optimizations (resize/restart/cleanup)."
         self.tools = []
         self.description = "Agent that analyzes Azure VM metrics and suggests or applies optimizations to improve performance and reduce cost."
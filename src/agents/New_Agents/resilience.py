@@ -0,0 +1,236 @@
+"""Circuit breakers, negative caching and bounded retries for Azure SDK calls.
+
+Without this, an `AuthorizationFailed` on one resource is repeated for every
+metric of every sweep. `ResilientCaller.call()` wraps an SDK call keyed by
+(resource, operation):
+
+- permanent failures (authorization errors, missing resources) are cached for
+  `negative_ttl` seconds; calls during that time fail fast without reaching
+  Azure;
+- transient failures (throttling, timeouts, 5xx, connection errors) are
+  retried at most `retries` times with full-jitter exponential backoff;
+- `failure_threshold` consecutive failures open the breaker for `cooldown`
+  seconds, after which a single trial call is let through (half-open).
+
+Short-circuited calls raise `CircuitOpenError`. `metrics()` exports call
+counters, calls saved and the state of every breaker.
+
+The agents share `DEFAULT_CALLER`, so a misconfigured resource in a large
+fleet costs one call per cooldown rather than one per metric per sweep.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_PERMANENT_MARKERS = (
+    "AuthorizationFailed", "does not have authorization", "AuthenticationFailed",
+    "ResourceNotFound", "ResourceGroupNotFound", "SubscriptionNotFound", "InvalidResourceType",
+)
+_PERMANENT_TYPES = ("ClientAuthenticationError", "ResourceNotFoundError", "CredentialUnavailableError")
+_TRANSIENT_TYPES = ("ServiceRequestError", "ServiceResponseError", "ServiceRequestTimeoutError",
+                    "ServiceResponseTimeoutError", "TimeoutError", "ConnectionError")
+
+
+def is_permanent(error: BaseException) -> bool:
+    """True for failures that retrying cannot fix (auth, missing resource)."""
+    if type(error).__name__ in _PERMANENT_TYPES:
+        return True
+    status = getattr(error, "status_code", None)
+    if status in (401, 403, 404):
+        return True
+    msg = str(error)
+    return any(marker in msg for marker in _PERMANENT_MARKERS)
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for failures worth retrying (throttling, timeouts, server errors)."""
+    if is_permanent(error):
+        return False
+    if any(t in (c.__name__ for c in type(error).__mro__) for t in _TRANSIENT_TYPES):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 429) or (isinstance(status, int) and status >= 500)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the SDK while a breaker is open or a failure is cached."""
+
+    def __init__(self, key: Tuple[str, str], reason: str, last_error: Optional[BaseException] = None):
+        super().__init__(f"{key[1]} on {key[0]} short-circuited ({reason}): {last_error}")
+        self.key = key
+        self.reason = reason
+        self.last_error = last_error
+
+
+class _Breaker:
+    __slots__ = ("state", "failures", "opened_at", "cached_until", "last_error", "trial_in_flight")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.cached_until = 0.0
+        self.last_error = None
+        self.trial_in_flight = False
+
+
+class ResilientCaller:
+    """Per-(resource, operation) breakers, negative cache and retries."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0, negative_ttl: float = 300.0,
+                 retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.negative_ttl = negative_ttl
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sleep = sleep
+        self._breakers: Dict[Tuple[str, str], _Breaker] = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "sdk_calls": 0, "successes": 0, "failures": 0, "retries": 0,
+                         "short_circuited": 0, "negative_cache_hits": 0}
+
+    def _admit(self, key) -> _Breaker:
+        """Return the breaker for `key`, or raise CircuitOpenError if the call must not go out."""
+        now = self.clock()
+        with self._lock:
+            self.counters["calls"] += 1
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = _Breaker()
+            if now < breaker.cached_until:
+                self.counters["short_circuited"] += 1
+                self.counters["negative_cache_hits"] += 1
+                raise CircuitOpenError(key, "cached permanent failure", breaker.last_error)
+            if breaker.state == OPEN and now - breaker.opened_at >= self.cooldown:
+                breaker.state = HALF_OPEN
+            if breaker.state == OPEN or (breaker.state == HALF_OPEN and breaker.trial_in_flight):
+                self.counters["short_circuited"] += 1
+                raise CircuitOpenError(key, "breaker open", breaker.last_error)
+            if breaker.state == HALF_OPEN:
+                breaker.trial_in_flight = True
+            return breaker
+
+    def _record(self, breaker: _Breaker, error: Optional[BaseException]):
+        now = self.clock()
+        with self._lock:
+            breaker.trial_in_flight = False
+            if error is None:
+                self.counters["successes"] += 1
+                breaker.state, breaker.failures, breaker.last_error = CLOSED, 0, None
+                return
+            self.counters["failures"] += 1
+            breaker.failures += 1
+            breaker.last_error = error
+            if is_permanent(error):
+                breaker.cached_until = now + self.negative_ttl
+            if breaker.state == HALF_OPEN or breaker.failures >= self.failure_threshold:
+                breaker.state, breaker.opened_at = OPEN, now
+
+    def _abandon(self, breaker: _Breaker):
+        """Release an interrupted call; an interrupted half-open trial counts as a failed one."""
+        now = self.clock()
+        with self._lock:
+            if breaker.trial_in_flight:
+                breaker.trial_in_flight = False
+                breaker.state, breaker.opened_at = OPEN, now
+
+    def call(self, resource: str, operation: str, fn: Callable[..., Any], *args, retries: Optional[int] = None, **kwargs):
+        """Call `fn(*args, **kwargs)` under the breaker for (resource, operation)."""
+        key = (resource, operation)
+        breaker = self._admit(key)
+        attempts = 1 + (self.retries if retries is None else retries)
+        try:
+            for attempt in range(attempts):
+                with self._lock:
+                    self.counters["sdk_calls"] += 1
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt + 1 < attempts and is_transient(e):
+                        with self._lock:
+                            self.counters["retries"] += 1
+                        # Full jitter: uniform over [0, min(max, base * 2^attempt)].
+                        self.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+                        continue
+                    self._record(breaker, e)
+                    raise
+                self._record(breaker, None)
+                return result
+        except BaseException as e:
+            # KeyboardInterrupt, asyncio.CancelledError, ... (during the call or a
+            # backoff sleep) must not leave a half-open trial in flight forever.
+            if not isinstance(e, Exception):
+                self._abandon(breaker)
+            raise
+
+    def state(self, resource: str, operation: str) -> str:
+        breaker = self._breakers.get((resource, operation))
+        return breaker.state if breaker else CLOSED
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters plus breaker states, e.g. for export to Azure Monitor."""
+        now = self.clock()
+        with self._lock:
+            states = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+            open_keys = []
+            for (resource, operation), b in self._breakers.items():
+                states[b.state] += 1
+                if b.state != CLOSED or now < b.cached_until:
+                    open_keys.append({"resource": resource, "operation": operation, "state": b.state,
+                                      "negative_cached": now < b.cached_until, "last_error": str(b.last_error)})
+            return dict(self.counters, breakers=states, degraded=open_keys)
+
+
+DEFAULT_CALLER = ResilientCaller()
+
+
+if __name__ == "__main__":
+    # 1,000-VM fleet, 4 metrics per VM, one sweep per minute for an hour of
+    # virtual time. One VM lacks RBAC permissions (AuthorizationFailed) and
+    # 2% of calls fail transiently. Count the SDK calls actually made.
+    FLEET, METRICS, SWEEPS = 1000, 4, 60
+    virtual = [0.0]
+    rnd = random.Random(2)
+
+    class ThrottledError(Exception):
+        status_code = 429
+
+    sdk_calls = {"bad": 0, "all": 0}
+
+    def query(resource, metric):
+        sdk_calls["all"] += 1
+        if resource == "vm-0042":
+            sdk_calls["bad"] += 1
+            raise RuntimeError("(AuthorizationFailed) The client does not have authorization to perform action "
+                               "'Microsoft.Insights/metrics/read'")
+        if rnd.random() < 0.02:
+            raise ThrottledError("Too many requests")
+        return 42.0
+
+    caller = ResilientCaller(clock=lambda: virtual[0], sleep=lambda s: None)
+    failed = 0
+    for sweep in range(SWEEPS):
+        for i in range(FLEET):
+            resource = f"vm-{i:04d}"
+            for m in range(METRICS):
+                try:
+                    caller.call(resource, "metrics.query", query, resource, f"metric-{m}")
+                except Exception:
+                    failed += 1
+        virtual[0] += 60.0
+
+    naive_bad = SWEEPS * METRICS
+    m = caller.metrics()
+    print(f"{FLEET} VMs x {METRICS} metrics x {SWEEPS} sweeps = {m['calls']} calls, {sdk_calls['all']} reached the SDK")
+    print(f"misconfigured VM: {sdk_calls['bad']} SDK calls instead of {naive_bad} "
+          f"(negative TTL {caller.negative_ttl:.0f}s over {SWEEPS} min)")
+    print(f"retries={m['retries']} failures surfaced={failed} short_circuited={m['short_circuited']} "
+          f"breakers={m['breakers']}")
@@ -10,6 +10,11 @@ try:
 except Exception:
     AZURE_SDK_AVAILABLE = False
 
+try:
+    from .resilience import DEFAULT_CALLER, CircuitOpenError
+except Exception:
+    from resilience import DEFAULT_CALLER, CircuitOpenError
+
 
 class ResourceOptimizer:
     """Resource optimizer that recommends or applies VM optimizations.
@@ -26,9 +31,15 @@ class ResourceOptimizer:
     - AZURERESOURCEGROUP: resource group
     - AZURERESOURCENAME: VM name (resource name)
     - OPTIMIZER_DRY_RUN: if set to '1' (default), do not apply changes — just simulate
+
+    A `client` may be passed in place of ComputeManagementClient, e.g. the
+    replay backend from metric_replay.py. Compute calls go through
+    `resilience` (resilience.DEFAULT_CALLER unless given): reads retry
+    transient errors, writes are not retried, and failures on a VM trip its
+    breaker.
     """
 
-    def __init__(self, subscription: Optional[str] = None, rg: Optional[str] = None, vm_name: Optional[str] = None, dry_run: Optional[bool] = None):
+    def __init__(self, subscription: Optional[str] = None, rg: Optional[str] = None, vm_name: Optional[str] = None, dry_run: Optional[bool] = None, client=None, resilience=None):
         self.subscription = subscription or os.getenv("AZURESUBSCRIPTIONID", "")
         self.rg = rg or os.getenv("AZURERESOURCEGROUP", "")
         self.vm_name = vm_name or os.getenv("AZURERESOURCENAME", "")
@@ -37,8 +48,9 @@ class ResourceOptimizer:
         else:
             self.dry_run = dry_run
 
-        self.client = None
-        if AZURE_SDK_AVAILABLE:
+        self.resilience = resilience or DEFAULT_CALLER
+        self.client = client
+        if client is None and AZURE_SDK_AVAILABLE:
             try:
                 cred = AzureCliCredential()
                 self.client = ComputeManagementClient(cred, self.subscription)
@@ -46,41 +58,72 @@ class ResourceOptimizer:
                 print("Warning: could not initialize ComputeManagementClient; running in simulation mode.", e)
                 self.client = None
 
-    def get_vm(self):
-        """Return VM model/dict. In simulation mode returns a fake sample."""
+    def _target(self, resource: Optional[str] = None):
+        """(resource group, VM name) that `resource` refers to, or None if it is not a VM we can act on.
+
+        `resource` is an ARM id such as a finding's or incident root's resource;
+        None or this optimizer's own VM name means the configured VM.
+        """
+        if not resource or resource == self.vm_name:
+            return self.rg, self.vm_name
+        parts = resource.strip("/").split("/")
+        lowered = [p.lower() for p in parts]
+        # /subscriptions/{sub}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines/{name}
+        if (len(parts) == 8 and lowered[0] == "subscriptions" and lowered[2] == "resourcegroups"
+                and lowered[4] == "providers" and lowered[5] == "microsoft.compute"
+                and lowered[6] == "virtualmachines"
+                and (not self.subscription or lowered[1] == self.subscription.lower())):
+            return parts[3], parts[7]
+        return None
+
+    def _compute_call(self, target, operation, fn, *args, **kwargs):
+        rg, name = target
+        return self.resilience.call(f"{rg}/{name}", operation, fn, *args, **kwargs)
+
+    def _sample_vm(self, name: Optional[str] = None):
+        return {
+            "name": name or self.vm_name or "sample-vm",
+            "vm_size": "Standard_D4s_v3",
+            "os_disk_size_gb": 128,
+            "cpu_cores": 4,
+            "memory_gb": 16,
+            "power_state": "running",
+        }
+
+    def get_vm(self, target=None):
+        """Return VM model/dict for `target` (rg, name), by default the configured VM.
+
+        In simulation mode returns a fake sample.
+        """
+        rg, name = target or (self.rg, self.vm_name)
         if not self.client:
-            # Simulation sample
-            return {
-                "name": self.vm_name or "sample-vm",
-                "vm_size": "Standard_D4s_v3",
-                "os_disk_size_gb": 128,
-                "cpu_cores": 4,
-                "memory_gb": 16,
-                "power_state": "running",
-            }
+            return self._sample_vm(name)
 
         # Live mode: query compute client
         try:
-            vm = self.client.virtual_machines.get(self.rg, self.vm_name)
+            vm = self._compute_call((rg, name), "vm.get", self.client.virtual_machines.get, rg, name)
             # We intentionally avoid deep serialization; provide common fields
             hardware_profile = getattr(vm, "hardware_profile", None)
             storage_profile = getattr(vm, "storage_profile", None)
             return {
-                "name": getattr(vm, "name", self.vm_name),
+                "name": getattr(vm, "name", name),
                 "vm_size": getattr(hardware_profile, "vm_size", None),
                 "os_disk_size_gb": getattr(storage_profile, "os_disk", None) and getattr(storage_profile.os_disk, "disk_size_gb", None),
-                "power_state": self._get_power_state(),
+                "power_state": self._get_power_state((rg, name)),
             }
+        except CircuitOpenError:
+            return self._sample_vm(name)
         except Exception as e:
             print("Error fetching VM (running in simulation):", e)
-            return self.get_vm()
+            return self._sample_vm(name)
 
-    def _get_power_state(self):
+    def _get_power_state(self, target=None):
         """Attempt to read power state using instance view."""
         if not self.client:
             return "running"
+        rg, name = target or (self.rg, self.vm_name)
         try:
-            iv = self.client.virtual_machines.instance_view(self.rg, self.vm_name)
+            iv = self._compute_call((rg, name), "vm.instance_view", self.client.virtual_machines.instance_view, rg, name)
             states = [s.code for s in getattr(iv, "statuses", []) if s.code]
             # statuses include codes like PowerState/running
             for s in states:
@@ -112,6 +155,20 @@ class ResourceOptimizer:
                 return {"action": "no_action", "reason": f"Disk I/O normal {value}"}
         return {"action": "unknown_metric", "reason": "No rule for this metric"}
 
+    def recommend_incident(self, incident):
+        """Return a single recommendation for a grouped incident (see anomaly_correlation.py).
+
+        The recommendation targets the incident's probable root instead of
+        every affected resource.
+        """
+        root = incident.root
+        rec = self.recommend_action(root.metric, root.value)
+        affected = len(incident.resources)
+        if affected > 1:
+            rec["reason"] = f"{rec['reason']} on {incident.root_resource}, probable root of {affected} affected resources"
+        rec["resource"] = incident.root_resource
+        return rec
+
     def apply_action(self, recommendation: dict):
         """Apply or simulate the recommended action.
 
@@ -119,15 +176,27 @@ class ResourceOptimizer:
         - recommend_resize: suggest a VM size and optionally perform resize (live only)
         - recommend_restart: restart the VM (live only)
         - recommend_cleanup: log cleanup recommendation
+
+        The action targets `recommendation["resource"]` (e.g. an incident's
+        root) when present, otherwise the configured VM. A resource that is
+        not a VM in this subscription is reported, never acted on.
         """
         action = recommendation.get("action")
         reason = recommendation.get("reason")
-        vm = self.get_vm()
 
         # Default recommendation messages
         if action == "no_action":
             return {"status": "ok", "message": reason}
 
+        resource = recommendation.get("resource")
+        target = self._target(resource)
+        if target is None:
+            msg = f"{action} for {resource}: {reason} (not a VM this optimizer manages; no action taken)"
+            print(msg)
+            return {"status": "unknown_target", "message": msg}
+        rg, name = target
+        vm = self.get_vm(target)
+
         if action == "recommend_cleanup":
             msg = f"Recommend disk cleanup on {vm['name']}: {reason}"
             print(msg)
@@ -139,7 +208,8 @@ class ResourceOptimizer:
             if self.dry_run or not self.client:
                 return {"status": "simulated", "message": msg}
             try:
-                async_op = self.client.virtual_machines.begin_restart(self.rg, self.vm_name)
+                async_op = self._compute_call(target, "vm.restart", self.client.virtual_machines.begin_restart,
+                                              rg, name, retries=0)
                 async_op.wait()
                 return {"status": "applied", "message": msg}
             except Exception as e:
@@ -155,9 +225,10 @@ class ResourceOptimizer:
                 return {"status": "simulated", "message": msg}
             try:
                 # In Azure, changing VM size requires update of hardware_profile
-                vm_model = self.client.virtual_machines.get(self.rg, self.vm_name)
+                vm_model = self._compute_call(target, "vm.get", self.client.virtual_machines.get, rg, name)
                 vm_model.hardware_profile.vm_size = target_size
-                async_op = self.client.virtual_machines.begin_create_or_update(self.rg, self.vm_name, vm_model)
+                async_op = self._compute_call(target, "vm.update", self.client.virtual_machines.begin_create_or_update,
+                                              rg, name, vm_model, retries=0)
                 async_op.wait()
                 return {"status": "applied", "message": msg}
             except Exception as e:
@@ -0,0 +1,61 @@
+import math
+import random
+
+try:
+    # Prefer relative import when run as a package
+    from . import forecaster as forecaster_mod
+except Exception:
+    # Fallback when running as a script (sys.path adjusted)
+    import forecaster as forecaster_mod
+
+FleetForecaster = forecaster_mod.FleetForecaster
+NAN = float("nan")
+
+
+def fit_and_forecast(history, use_numpy, horizon=4, season_length=8):
+    saved = forecaster_mod.NUMPY_AVAILABLE
+    forecaster_mod.NUMPY_AVAILABLE = use_numpy
+    try:
+        keys = [(f"vm-{i}", "Percentage CPU") for i in range(len(history))]
+        f = FleetForecaster(keys, season_length=season_length).fit(history)
+        mean, lower, upper = f.forecast(horizon)
+        as_rows = (lambda a: a.tolist()) if use_numpy else (lambda a: a)
+        return as_rows(mean), as_rows(lower), as_rows(upper)
+    finally:
+        forecaster_mod.NUMPY_AVAILABLE = saved
+
+
+def assert_close(a, b, label):
+    for row_a, row_b in zip(a, b):
+        for x, y in zip(row_a, row_b):
+            assert not (math.isnan(x) or math.isnan(y)), f"{label}: NaN in forecast ({x}, {y})"
+            assert abs(x - y) <= 1e-6 * max(1.0, abs(x)), f"{label}: {x} != {y}"
+
+
+def run_manual_tests():
+    if not forecaster_mod.NUMPY_AVAILABLE:
+        print("numpy not installed; only the pure-Python path is available, skipping comparison.")
+        return
+
+    rnd = random.Random(4)
+    m, n = 8, 40
+    history = []
+    for i in range(6):
+        row = [50 + 20 * math.sin(2 * math.pi * k / m) + k * 0.5 + rnd.gauss(0, 2) for k in range(n)]
+        history.append(row)
+    history[1][:m] = [NAN] * m                 # first season missing entirely
+    history[2][m:2 * m] = [NAN] * m            # second season (trend seed) missing
+    history[3][::3] = [NAN] * len(history[3][::3])  # scattered gaps
+    history[4][-5:] = [NAN] * 5                # trailing gap
+    history[5][:m] = [NAN] * (m - 1) + [60.0]  # a single sample in the first season
+
+    numpy_result = fit_and_forecast(history, use_numpy=True, season_length=m)
+    python_result = fit_and_forecast(history, use_numpy=False, season_length=m)
+    for label, a, b in zip(("mean", "lower", "upper"), numpy_result, python_result):
+        assert_close(a, b, label)
+    print("Series with an empty first season forecasts:", [round(v, 1) for v in numpy_result[0][1]])
+    print("numpy and pure-Python paths agree on NaN-gapped input.")
+
+
+if __name__ == "__main__":
+    run_manual_tests()
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+try:
+    # Prefer relative import when run as a package
+    from .model_router import (BudgetExceeded, ChatCompletionsEndpoint, FakeModelEndpoint, ModelRouter,
+                               count_message_tokens)
+except Exception:
+    # Fallback when running as a script (sys.path adjusted)
+    from model_router import (BudgetExceeded, ChatCompletionsEndpoint, FakeModelEndpoint, ModelRouter,
+                              count_message_tokens)
+
+
+class FakeChatClient:
+    """Shape of an (Azure) OpenAI client: chat.completions.create() -> choices/usage."""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, max_tokens):
+        self.requests.append({"model": model, "messages": messages, "max_tokens": max_tokens})
+        message = SimpleNamespace(content="Scale out the web tier.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(prompt_tokens=31, completion_tokens=7, total_tokens=38))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_manual_tests():
+    clock = FakeClock()
+    endpoint = FakeModelEndpoint(reply="Resize vm-01 to Standard_D8s_v3 because CPU stays above 90%.")
+    router = ModelRouter(endpoint, request_budget=400, minute_budget=1000, clock=clock)
+
+    # Accounting matches the usage reported by the endpoint, per request/agent/step
+    request = router.start_request("req-1")
+    prompt = [{"role": "system", "content": "You route messages."}, {"role": "user", "content": "Check CPU usage"}]
+    router.invoke("OrchestratorAgent", "route", "routing", prompt, max_tokens=50, request=request)
+    router.invoke("ResourceOptimizerAgent", "explain", "root_cause", prompt, max_tokens=50, request=request)
+    usage = router.usage()
+    print("Usage:", usage)
+    route = usage[("req-1", "OrchestratorAgent", "route")]
+    assert route["prompt_tokens"] == count_message_tokens(prompt)
+    assert sum(t["prompt_tokens"] + t["completion_tokens"] for t in usage.values()) == request.used
+    assert all(entry["usage_reported"] for entry in router.ledger)
+
+    # Routing by task type: cheap tier for routing, large tier for root cause
+    print("Tiers:", [(e["task"], e["tier"], e["model"]) for e in router.ledger])
+    assert [e["tier"] for e in router.ledger] == ["small", "large"]
+
+    # Steps down a tier once the request budget is mostly spent
+    request.used = 350
+    router.invoke("ResourceOptimizerAgent", "explain", "root_cause", prompt, max_tokens=50, request=request)
+    assert router.ledger[-1]["tier"] == "standard", router.ledger[-1]
+    assert endpoint.calls[-1]["max_tokens"] <= 400 - 350
+
+    # Per-request budget is enforced before the call
+    try:
+        router.invoke("ResourceOptimizerAgent", "explain", "root_cause", prompt, request=request)
+        raise AssertionError("request budget not enforced")
+    except BudgetExceeded as e:
+        print("Request budget:", e)
+        assert e.scope == "request"
+
+    # Per-minute budget is enforced and frees up after a minute
+    calls_before = len(endpoint.calls)
+    try:
+        for _ in range(20):
+            router.invoke("AnomalyDetectorAgent", "summarize", "summary", prompt, max_tokens=100)
+        raise AssertionError("minute budget not enforced")
+    except BudgetExceeded as e:
+        print("Minute budget:", e, "retry after", e.retry_after)
+        assert e.scope == "minute" and e.retry_after > 0
+    assert router.minute_used() <= 1000
+    clock.now += 61
+    router.invoke("AnomalyDetectorAgent", "summarize", "summary", prompt, max_tokens=100)
+    assert len(endpoint.calls) > calls_before
+
+    # Without reported usage the local tokenizer fills in
+    endpoint.complete = lambda **kw: type("R", (), {"content": "ok", "usage": None})()
+    router.invoke("AnomalyDetectorAgent", "summarize", "summary", prompt, max_tokens=10)
+    assert router.ledger[-1]["usage_reported"] is False
+    assert router.ledger[-1]["prompt_tokens"] == count_message_tokens(prompt)
+
+    # The chat completions adapter passes the routed deployment through and uses the reported usage
+    client = FakeChatClient()
+    router = ModelRouter(ChatCompletionsEndpoint(client), clock=clock)
+    request = router.start_request("req-2")
+    reply = router.invoke("ResourceOptimizerAgent", "explain", "optimization", prompt, max_tokens=64, request=request)
+    assert reply == "Scale out the web tier."
+    assert client.requests[-1]["model"] == router.tiers["standard"].deployment
+    assert client.requests[-1]["max_tokens"] == 64 and client.requests[-1]["messages"] == prompt
+    assert (router.ledger[-1]["prompt_tokens"], router.ledger[-1]["completion_tokens"]) == (31, 7)
+    assert router.ledger[-1]["usage_reported"] and request.used == 38
+    print("All model router checks passed.")
+
+
+if __name__ == "__main__":
+    run_manual_tests()
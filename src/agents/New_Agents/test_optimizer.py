@@ -1,9 +1,44 @@
+from types import SimpleNamespace
+
 try:
     # Prefer relative import when run as a package
     from .resource_optimizer import ResourceOptimizer
+    from .anomaly_correlation import Incident
+    from .payloads import MetricFinding
+    from .resilience import ResilientCaller
 except Exception:
     # Fallback when running as a script (sys.path adjusted)
     from resource_optimizer import ResourceOptimizer
+    from anomaly_correlation import Incident
+    from payloads import MetricFinding
+    from resilience import ResilientCaller
+
+SUB = "00000000-0000-0000-0000-000000000000"
+
+
+def vm_id(rg, name):
+    return f"/subscriptions/{SUB}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines/{name}"
+
+
+class FakeVirtualMachines:
+    """Records which VM every compute call was made for."""
+
+    def __init__(self):
+        self.calls = []
+        done = SimpleNamespace(wait=lambda: None)
+        self.begin_restart = lambda rg, name: self._record("restart", rg, name, done)
+        self.begin_create_or_update = lambda rg, name, model: self._record("update", rg, name, done)
+
+    def _record(self, op, rg, name, result):
+        self.calls.append((op, rg, name))
+        return result
+
+    def get(self, rg, name):
+        self.calls.append(("get", rg, name))
+        return SimpleNamespace(name=name, hardware_profile=SimpleNamespace(vm_size="Standard_D4s_v3"), storage_profile=None)
+
+    def instance_view(self, rg, name):
+        return SimpleNamespace(statuses=[SimpleNamespace(code="PowerState/running")])
 
 
 def run_manual_tests():
@@ -30,6 +65,26 @@ def run_manual_tests():
     res = opt.apply_action(rec)
     print("Disk apply result:", res)
 
+    # Incident recommendations act on the incident's root VM, not on the optimizer's own VM
+    vms = FakeVirtualMachines()
+    opt = ResourceOptimizer(subscription=SUB, rg="rg-web", vm_name="web-01", dry_run=False,
+                            client=SimpleNamespace(virtual_machines=vms), resilience=ResilientCaller())
+    db = vm_id("rg-data", "db-01")
+    incident = Incident(db, "Percentage CPU", [MetricFinding(db, "Percentage CPU", 95.0, 1.0),
+                                               MetricFinding(vm_id("rg-web", "web-01"), "Percentage CPU", 88.0, 2.0)])
+    res = opt.apply_action(opt.recommend_incident(incident))
+    print("Incident apply result:", res)
+    assert res["status"] == "applied" and "db-01" in res["message"], res
+    assert ("update", "rg-data", "db-01") in vms.calls
+    assert not any(name == "web-01" for _, _, name in vms.calls), vms.calls
+
+    # A root that is not a VM (here a web app) is reported, never acted on
+    vms.calls.clear()
+    site = f"/subscriptions/{SUB}/resourceGroups/rg-web/providers/Microsoft.Web/sites/shop"
+    res = opt.apply_action(opt.recommend_incident(Incident(site, "CpuPercentage", [MetricFinding(site, "CpuPercentage", 97.0, 1.0)])))
+    print("Non-VM root result:", res)
+    assert res["status"] == "unknown_target" and not vms.calls
+
 
 if __name__ == "__main__":
     run_manual_tests()
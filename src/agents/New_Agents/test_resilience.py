@@ -0,0 +1,144 @@
+try:
+    # Prefer relative import when run as a package
+    from .resilience import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, ResilientCaller
+except Exception:
+    # Fallback when running as a script (sys.path adjusted)
+    from resilience import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, ResilientCaller
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+class CountingCall:
+    """SDK call stand-in that raises the queued errors, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def expect_short_circuit(caller, fn, reason):
+    try:
+        caller.call("vm-01", "metrics.query", fn)
+    except CircuitOpenError as e:
+        assert reason in e.reason, e.reason
+        return e
+    raise AssertionError("call was not short-circuited")
+
+
+def run_manual_tests():
+    # Permanent failures are cached for negative_ttl without reaching the SDK
+    clock = FakeClock()
+    caller = ResilientCaller(failure_threshold=10, negative_ttl=300, clock=clock, sleep=lambda s: None)
+    fn = CountingCall(RuntimeError("(AuthorizationFailed) The client does not have authorization"))
+    try:
+        caller.call("vm-01", "metrics.query", fn)
+        raise AssertionError("permanent error was swallowed")
+    except RuntimeError:
+        pass
+    assert fn.calls == 1, "permanent errors must not be retried"
+    clock.now = 299
+    e = expect_short_circuit(caller, fn, "cached")
+    assert fn.calls == 1 and "AuthorizationFailed" in str(e.last_error)
+    clock.now = 300
+    assert caller.call("vm-01", "metrics.query", fn) == "ok" and fn.calls == 2
+    print("Negative cache:", caller.metrics()["negative_cache_hits"], "hit(s), expired after negative_ttl")
+
+    # The breaker opens after failure_threshold consecutive failures
+    clock = FakeClock()
+    caller = ResilientCaller(failure_threshold=3, cooldown=60, retries=0, clock=clock, sleep=lambda s: None)
+    fn = CountingCall(*[ThrottledError("Too many requests") for _ in range(5)])
+    for i in range(3):
+        assert caller.state("vm-01", "metrics.query") == CLOSED, f"opened early after {i} failures"
+        try:
+            caller.call("vm-01", "metrics.query", fn)
+        except ThrottledError:
+            pass
+    assert caller.state("vm-01", "metrics.query") == OPEN
+    expect_short_circuit(caller, fn, "breaker open")
+    assert fn.calls == 3
+    assert caller.state("vm-02", "metrics.query") == CLOSED, "breakers are per resource"
+    print("Breaker opened after", fn.calls, "failures")
+
+    # After cooldown exactly one trial call goes through (half-open)
+    clock.now = 59
+    expect_short_circuit(caller, fn, "breaker open")
+    clock.now = 60
+    trial_results = []
+
+    def trial():
+        # A concurrent caller arriving while the trial is in flight is short-circuited.
+        assert caller.state("vm-01", "metrics.query") == HALF_OPEN
+        trial_results.append(expect_short_circuit(caller, fn, "breaker open"))
+        return fn()
+
+    try:
+        caller.call("vm-01", "metrics.query", trial)
+    except ThrottledError:
+        pass
+    assert len(trial_results) == 1 and fn.calls == 4
+    assert caller.state("vm-01", "metrics.query") == OPEN, "a failed trial must reopen the breaker"
+    expect_short_circuit(caller, fn, "breaker open")
+    clock.now = 120
+    fn.errors = []
+    assert caller.call("vm-01", "metrics.query", fn) == "ok" and fn.calls == 5
+    assert caller.state("vm-01", "metrics.query") == CLOSED
+    print("Half-open: one trial per cooldown, closed again after a successful trial")
+
+    # An interrupted trial (KeyboardInterrupt, task cancellation) is released, not left in flight
+    caller = ResilientCaller(failure_threshold=1, cooldown=60, retries=0, clock=clock, sleep=lambda s: None)
+    clock.now = 0
+    fn = CountingCall(ThrottledError("Too many requests"))
+    try:
+        caller.call("vm-01", "metrics.query", fn)
+    except ThrottledError:
+        pass
+    clock.now = 60
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    try:
+        caller.call("vm-01", "metrics.query", interrupted)
+        raise AssertionError("interrupt was swallowed")
+    except KeyboardInterrupt:
+        pass
+    assert caller.state("vm-01", "metrics.query") == OPEN, "an interrupted trial counts as a failed one"
+    expect_short_circuit(caller, fn, "breaker open")
+    clock.now = 120
+    assert caller.call("vm-01", "metrics.query", fn) == "ok"
+    assert caller.state("vm-01", "metrics.query") == CLOSED
+    print("Interrupted trial released; next trial allowed after cooldown")
+
+    # Transient errors are retried, but not when the caller passes retries=0 (writes)
+    caller = ResilientCaller(retries=2, clock=FakeClock(), sleep=lambda s: None)
+    fn = CountingCall(ThrottledError("Too many requests"), ThrottledError("Too many requests"))
+    assert caller.call("vm-01", "compute.get", fn) == "ok" and fn.calls == 3
+    fn = CountingCall(ThrottledError("Too many requests"))
+    try:
+        caller.call("vm-01", "compute.resize", fn, retries=0)
+        raise AssertionError("write error was swallowed")
+    except ThrottledError:
+        pass
+    assert fn.calls == 1, "writes with retries=0 must not be retried"
+    print("Retries:", caller.metrics()["retries"], "for reads, none for writes")
+    print("All resilience checks passed.")
+
+
+if __name__ == "__main__":
+    run_manual_tests()
@@ -0,0 +1,211 @@
+"""Bounded agent threads with compaction for LLM context.
+
+A thread used by `orchestratedynamic` only grows, so any LLM-backed agent
+reading it would receive an ever-longer context. `CompactingThread` keeps the
+most recent messages of each agent verbatim and rolls everything older into a
+single structured digest message, while `TokenBudget` tracks the token size of
+the thread and forces further compaction when it exceeds its budget.
+
+Compaction runs when `compact()` is called (the orchestrator does this at the
+end of each turn), so message positions are stable while a turn is running.
+
+Token counts use tiktoken when it is installed and a local word-piece
+estimate otherwise.
+"""
+
+import math
+import re
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+try:
+    from .payloads import decode_findings
+except Exception:
+    from payloads import decode_findings
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text` for a gpt-35-turbo-style tokenizer."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # Roughly one token per 4 characters of a word, one per punctuation mark.
+    return sum(max(1, math.ceil(len(w) / 4)) for w in _WORDS.findall(text))
+
+
+def _sender(msg) -> str:
+    return getattr(msg, "agent", None) or getattr(msg, "role", None) or "unknown"
+
+
+def _note(msg) -> str:
+    """What a folded message said: its findings, else its non-header lines."""
+    payload = getattr(msg, "payload", None)
+    if isinstance(payload, (bytes, bytearray)):
+        try:
+            findings = decode_findings(payload)
+        except ValueError:
+            findings = []
+        if findings:
+            return "; ".join(f"{f.resource.rsplit('/', 1)[-1]} {f.metric}={f.value:g}" for f in findings)
+    # Agent messages open with a fixed header line such as "⚠️ Anomalies detected:".
+    lines = [line.strip() for line in (getattr(msg, "content", "") or "").splitlines()]
+    return "; ".join(line for line in lines if line and not line.endswith(":"))
+
+
+class DigestMessage:
+    """Stand-in for the messages rolled out of a thread."""
+
+    def __init__(self, content: str, role: str = "system"):
+        self.content = content
+        self.role = role
+
+
+class TokenBudget:
+    """Token accountant for one thread."""
+
+    def __init__(self, max_tokens: int = 3000):
+        self.max_tokens = max_tokens
+        self.total = 0
+        self.peak = 0
+
+    def add(self, tokens: int):
+        self.total += tokens
+        self.peak = max(self.peak, self.total)
+
+    def remove(self, tokens: int):
+        self.total -= tokens
+
+    @property
+    def over(self) -> bool:
+        return self.total > self.max_tokens
+
+
+class CompactingThread:
+    """Thread that keeps the last `keep_per_agent` messages of each sender verbatim.
+
+    Older messages are folded into a digest that records how many messages
+    each sender contributed and a short, bounded list of what they said
+    (decoded findings for payload messages, otherwise the text without its
+    header line).
+    If the thread is still over its token budget after that, the oldest
+    verbatim messages are folded too, always keeping the newest one.
+    """
+
+    def __init__(self, keep_per_agent: int = 4, max_tokens: int = 3000, digest_notes: int = 8, note_chars: int = 120):
+        self.keep_per_agent = keep_per_agent
+        self.budget = TokenBudget(max_tokens)
+        self.note_chars = note_chars
+        self._messages: List = []
+        self._tokens: List[int] = []
+        self._compacted = 0
+        self._compacted_by_sender: Counter = Counter()
+        self._notes: deque = deque(maxlen=digest_notes)
+        self._digest: Optional[DigestMessage] = None
+        self._digest_tokens = 0
+
+    def send_message(self, msg):
+        tokens = count_tokens(getattr(msg, "content", "") or "")
+        self._messages.append(msg)
+        self._tokens.append(tokens)
+        self.budget.add(tokens)
+
+    @property
+    def messages(self) -> List:
+        return ([self._digest] if self._digest is not None else []) + self._messages
+
+    def compact(self):
+        """Roll older messages into the digest until the thread is within bounds."""
+        keep = set()
+        seen: Dict[str, int] = Counter()
+        for i in range(len(self._messages) - 1, -1, -1):
+            sender = _sender(self._messages[i])
+            if seen[sender] < self.keep_per_agent:
+                seen[sender] += 1
+                keep.add(i)
+
+        # The newest message always survives, even when it alone exceeds the budget.
+        drop = [i for i in range(len(self._messages)) if i not in keep]
+        for i in sorted(keep):
+            if i == len(self._messages) - 1 or not self._over_after(drop):
+                break
+            drop.append(i)
+        if drop:
+            self._fold(sorted(drop))
+
+    def _over_after(self, drop) -> bool:
+        remaining = self.budget.total - sum(self._tokens[i] for i in drop)
+        return remaining + self._digest_tokens > self.budget.max_tokens
+
+    def _fold(self, indices):
+        for i in indices:
+            msg = self._messages[i]
+            sender = _sender(msg)
+            self._compacted += 1
+            self._compacted_by_sender[sender] += 1
+            note = _note(msg)
+            if note:
+                self._notes.append(f"{sender}: {note[:self.note_chars]}")
+            self.budget.remove(self._tokens[i])
+        dropped = set(indices)
+        self._messages = [m for i, m in enumerate(self._messages) if i not in dropped]
+        self._tokens = [t for i, t in enumerate(self._tokens) if i not in dropped]
+
+        by_sender = ", ".join(f"{s}={n}" for s, n in sorted(self._compacted_by_sender.items()))
+        lines = [f"[Earlier conversation: {self._compacted} messages ({by_sender})]"]
+        lines.extend(f"- {note}" for note in self._notes)
+        self.budget.remove(self._digest_tokens)
+        self._digest = DigestMessage("\n".join(lines))
+        self._digest_tokens = count_tokens(self._digest.content)
+        self.budget.add(self._digest_tokens)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "messages": len(self.messages),
+            "verbatim_messages": len(self._messages),
+            "compacted_messages": self._compacted,
+            "tokens": self.budget.total,
+            "digest_tokens": self._digest_tokens,
+            "peak_tokens": self.budget.peak,
+        }
+
+
+if __name__ == "__main__":
+    # 10k-turn synthetic conversation: prompt tokens and memory per turn must
+    # stay flat once the thread reaches its steady state.
+    import random
+    import tracemalloc
+
+    TURNS = 10_000
+    rnd = random.Random(5)
+    metrics = ["Percentage CPU", "Available Memory Bytes", "Disk Read Bytes"]
+
+    def message(role, content):
+        return DigestMessage(content, role=role)
+
+    thread = CompactingThread(keep_per_agent=4, max_tokens=1500)
+    tracemalloc.start()
+    print(f"{'turn':>6} {'messages':>9} {'prompt tokens':>14} {'compacted':>10} {'traced KiB':>11}")
+    for turn in range(1, TURNS + 1):
+        thread.send_message(message("user", f"Check {rnd.choice(metrics)} on vm-{rnd.randrange(50):02d}"))
+        if rnd.random() < 0.5:
+            lines = [f"{m} = {rnd.uniform(0, 100):.2f}" for m in rnd.sample(metrics, rnd.randint(1, 3))]
+            thread.send_message(message("anomaly", "⚠️ Anomalies detected:\n" + "\n".join(lines)))
+            thread.send_message(message("optimizer", f"🛠️ Optimization: Recommend resizing VM vm-{turn % 50:02d} to Standard_D8s_v3"))
+        thread.send_message(message("alert", f"ALERT: turn {turn} handled"))
+        thread.compact()
+        if turn in (10, 100, 1000, 5000, TURNS):
+            current, _ = tracemalloc.get_traced_memory()
+            s = thread.stats()
+            print(f"{turn:>6} {s['messages']:>9} {s['tokens']:>14} {s['compacted_messages']:>10} {current / 1024:>11.1f}")
+    print(f"peak prompt tokens over {TURNS} turns: {thread.budget.peak} (budget {thread.budget.max_tokens})")
+    print("\nDigest after the last turn:")
+    print(thread.messages[0].content)
@@ -2,22 +2,33 @@ import os
 import semantic_kernel as sk
 
 
-def orchestratedynamic(self, userinput, use_semantic_kernel=False):
-    thread = self.createthread()
+def orchestratedynamic(self, userinput, use_semantic_kernel=False, thread=None, request=None):
+    # Pass `thread` to continue a conversation; only this turn's messages are routed
+    if thread is None:
+        thread = self.createthread()
+    turnstart = len(self.getthreadmessages(thread))
+
+    # With a model router, this turn's model calls are accounted to one request budget;
+    # agents find it on the thread
+    router = getattr(self, "router", None)
+    if request is None and router is not None:
+        request = router.start_request()
+    if request is not None:
+        thread.request = request
 
     # Step 1: Anomaly Detector
     self.sendtoagent(thread, "anomaly", userinput)
 
     # Step 2: Read anomaly message
-    messages = self.getthreadmessages(thread)
-    anomalymsg = next((m.content for m in messages if "Anomaly" in m.content), None)
+    messages = self.getthreadmessages(thread)[turnstart:]
+    anomalymsg = next((m for m in messages if getattr(m, "payload", None) or "Anomal" in m.content), None)
 
-    # Step 3: Resource Optimizer
+    # Step 3: Resource Optimizer (prefer the typed findings payload over the display text)
     if anomalymsg:
-        self.sendtoagent(thread, "optimizer", anomalymsg)
+        self.sendtoagent(thread, "optimizer", getattr(anomalymsg, "payload", None) or anomalymsg.content)
 
     # Step 4: Read optimization message
-    messages = self.getthreadmessages(thread)
+    messages = self.getthreadmessages(thread)[turnstart:]
     optimizationmsg = next((m.content for m in messages if "🛠️" in m.content), None)
 
     # Step 5: Alert Manager
@@ -34,6 +45,10 @@ def orchestratedynamic(self, userinput, use_semantic_kernel=False):
         except Exception as e:
             print("Semantic Kernel planning failed:", e)
 
+    # Roll older messages into a digest so the context stays bounded across turns
+    if hasattr(thread, "compact"):
+        thread.compact()
+
     # Return all messages with role awareness
     messages = self.getthreadmessages(thread)
     return [f"{msg.role}: {msg.content}" for msg in messages]
\ No newline at end of file
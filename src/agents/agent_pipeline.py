@@ -0,0 +1,249 @@
+"""Asynchronous agent pipeline with bounded queues between stages.
+
+`orchestratedynamic` hands work from agent to agent synchronously, so a slow
+optimizer blocks detection and nothing limits how much work piles up. This
+module runs the detector, optimizer and alert steps as stages connected by
+bounded `asyncio.Queue`s:
+
+- each stage has its own worker count and input queue size;
+- a worker blocks on `put()` when the next stage's queue is full, so
+  backpressure propagates upstream all the way to `submit()`;
+- per-stage queue depth, wait time and throughput are exposed via `gauges()`;
+  time spent blocked on a full downstream queue is reported separately as
+  `put_block_*`, so it is not also counted as downstream wait.
+
+Handlers may be coroutines or plain functions. Plain functions (the agents
+make blocking SDK calls) run in the default executor so they do not stall the
+event loop. A handler returning None drops the item.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_STOP = object()
+
+
+class Stage:
+    """A named processing step with its own workers and bounded input queue."""
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1, maxsize: int = 100):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1 (an unbounded queue disables backpressure)")
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.queue: Optional[asyncio.Queue] = None
+
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.put_block_total = 0.0
+        self.put_block_max = 0.0
+        self.started_at: Optional[float] = None
+
+    def gauges(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        done = self.processed + self.errors
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.maxsize,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_wait_s": self.wait_total / done if done else 0.0,
+            "max_wait_s": self.wait_max,
+            "avg_put_block_s": self.put_block_total / self.processed if self.processed else 0.0,
+            "max_put_block_s": self.put_block_max,
+            "throughput_per_s": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class AgentPipeline:
+    """Chain of stages; the output of each stage is the input of the next."""
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("AgentPipeline requires at least one stage")
+        self.stages = stages
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        now = time.monotonic()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.maxsize)
+            stage.started_at = now
+        for i, stage in enumerate(self.stages):
+            downstream = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            for _ in range(stage.workers):
+                self._tasks.append(asyncio.create_task(self._worker(stage, downstream)))
+
+    async def submit(self, item: Any):
+        """Enqueue work for the first stage; waits while the pipeline is saturated."""
+        entry = [time.monotonic(), item]
+        await self.stages[0].queue.put(entry)
+        entry[0] = time.monotonic()
+
+    async def join(self):
+        """Wait until every submitted item has left the last stage."""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def stop(self):
+        """Drain in-flight work, then shut the workers down."""
+        await self.join()
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                await stage.queue.put((time.monotonic(), _STOP))
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+
+    def gauges(self) -> Dict[str, Dict[str, Any]]:
+        return {stage.name: stage.gauges() for stage in self.stages}
+
+    async def _worker(self, stage: Stage, downstream: Optional[Stage]):
+        loop = asyncio.get_running_loop()
+        is_async = inspect.iscoroutinefunction(stage.handler)
+        while True:
+            enqueued_at, item = await stage.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                wait = time.monotonic() - enqueued_at
+                stage.wait_total += wait
+                stage.wait_max = max(stage.wait_max, wait)
+
+                stage.busy += 1
+                try:
+                    if is_async:
+                        result = await stage.handler(item)
+                    else:
+                        result = await loop.run_in_executor(None, stage.handler, item)
+                except Exception as e:
+                    stage.errors += 1
+                    print(f"Pipeline stage '{stage.name}' failed:", e)
+                    continue
+                finally:
+                    stage.busy -= 1
+
+                stage.processed += 1
+                if result is None:
+                    stage.dropped += 1
+                elif downstream is not None:
+                    # Blocks while the next stage is full: this is the backpressure.
+                    # The entry is restamped once it is actually queued (before the
+                    # loop yields again), so downstream wait excludes the time spent
+                    # blocked here; that is counted as this stage's put-block time.
+                    blocked_at = time.monotonic()
+                    entry = [blocked_at, result]
+                    await downstream.queue.put(entry)
+                    entry[0] = time.monotonic()
+                    blocked = entry[0] - blocked_at
+                    stage.put_block_total += blocked
+                    stage.put_block_max = max(stage.put_block_max, blocked)
+            finally:
+                stage.queue.task_done()
+
+
+def build_agent_pipeline(anomaly_agent, optimizer, alert: Optional[Callable[[Any], Any]] = None,
+                         detector_workers: int = 1, optimizer_workers: int = 1, alert_workers: int = 1,
+                         maxsize: int = 100, correlator=None) -> AgentPipeline:
+    """Wire the anomaly detector, resource optimizer and alert step into a pipeline.
+
+    Items submitted to the pipeline are detection triggers (e.g. the user input);
+    the detector stage forwards its findings only when something is anomalous.
+    `anomaly_agent` may be one AnomalyDetectorAgent or a list of them (one per
+    resource); each trigger sweeps all of them.
+    With a `correlator` (a CorrelationTracker), the sweep's metric values are
+    buffered and fed to its history as one fleet tick, correlated findings are
+    grouped into incidents and the optimizer acts once per incident.
+    """
+    agents = list(anomaly_agent) if isinstance(anomaly_agent, (list, tuple)) else [anomaly_agent]
+
+    def detect(_trigger):
+        values = {} if correlator is not None else None
+        findings = []
+        for agent in agents:
+            findings.extend(agent.detect(observe=values.update if values is not None else None) or [])
+        if values:
+            correlator.observe(values)
+        return findings or None
+
+    def optimize(findings):
+        if correlator is not None:
+            return [optimizer.apply_action(optimizer.recommend_incident(i)) for i in correlator.group(findings)]
+        return [optimizer.apply_action(optimizer.recommend_action(f.metric, f.value)) for f in findings]
+
+    def notify(results):
+        if alert is not None:
+            return alert(results)
+        for res in results:
+            print(f"ALERT: {res.get('message', res)}")
+        return results
+
+    return AgentPipeline([
+        Stage("detector", detect, workers=detector_workers, maxsize=maxsize),
+        Stage("optimizer", optimize, workers=optimizer_workers, maxsize=maxsize),
+        Stage("alert", notify, workers=alert_workers, maxsize=maxsize),
+    ])
+
+
+if __name__ == "__main__":
+    # Soak test: stubbed stages at different speeds, fed by a producer that is
+    # much faster than the slowest stage. Memory must stay bounded and
+    # throughput should settle at the optimizer's capacity (workers / delay).
+    import tracemalloc
+
+    def stub(delay):
+        async def handler(item):
+            await asyncio.sleep(delay)
+            return item
+        return handler
+
+    async def soak(items=6000, report_every=1.0):
+        pipeline = AgentPipeline([
+            Stage("detector", stub(0.001), workers=2, maxsize=50),
+            Stage("optimizer", stub(0.005), workers=4, maxsize=50),
+            Stage("alert", stub(0.0005), workers=1, maxsize=50),
+        ])
+        await pipeline.start()
+        tracemalloc.start()
+
+        async def reporter():
+            last = 0
+            while True:
+                await asyncio.sleep(report_every)
+                g = pipeline.gauges()
+                done = g["alert"]["processed"]
+                _, peak = tracemalloc.get_traced_memory()
+                depths = " ".join(f"{name}={s['queue_depth']:>3}" for name, s in g.items())
+                print(f"rate={(done - last) / report_every:7.1f}/s  depth[{depths}]  "
+                      f"optimizer_wait={g['optimizer']['avg_wait_s'] * 1e3:6.1f}ms  peak_mem={peak / 1024:8.1f}KiB")
+                last = done
+
+        report = asyncio.create_task(reporter())
+        start = time.monotonic()
+        for i in range(items):
+            await pipeline.submit({"id": i, "payload": b"x" * 256})
+        await pipeline.stop()
+        elapsed = time.monotonic() - start
+        report.cancel()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"\n{items} items in {elapsed:.2f}s ({items / elapsed:.1f}/s), peak traced memory {peak / 1024:.1f}KiB")
+        for name, g in pipeline.gauges().items():
+            print(f"{name:<10} processed={g['processed']:<6} avg_wait={g['avg_wait_s'] * 1e3:7.2f}ms "
+                  f"max_wait={g['max_wait_s'] * 1e3:7.2f}ms put_block={g['avg_put_block_s'] * 1e3:7.2f}ms "
+                  f"throughput={g['throughput_per_s']:.1f}/s")
+
+    asyncio.run(soak())
@@ -4,7 +4,6 @@ expected by `orchestratedynamic` in `src/agents/agent_orchestrator.py`.
 """
 import sys
 import os
-import re
 
 # Ensure the New_Agents folder is importable
 ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -24,34 +23,45 @@ def load_module_from_path(name, path):
     spec.loader.exec_module(module)
     return module
 
+payloads_mod = load_module_from_path("payloads", os.path.join(AGENTS_DIR, "payloads.py"))
+compaction_mod = load_module_from_path("thread_compaction", os.path.join(AGENTS_DIR, "thread_compaction.py"))
+router_mod = load_module_from_path("model_router", os.path.join(AGENTS_DIR, "model_router.py"))
 anomaly_mod = load_module_from_path("anomaly_detector", anomaly_path)
 resource_mod = load_module_from_path("resource_optimizer", resource_path)
 
 AnomalyDetectorAgent = getattr(anomaly_mod, "AnomalyDetectorAgent")
 ResourceOptimizer = getattr(resource_mod, "ResourceOptimizer")
+decode_findings = getattr(payloads_mod, "decode_findings")
+CompactingThread = getattr(compaction_mod, "CompactingThread")
+ModelRouter = getattr(router_mod, "ModelRouter")
+FakeModelEndpoint = getattr(router_mod, "FakeModelEndpoint")
 
 # Import the orchestrator function
 from src.agents.agent_orchestrator import orchestratedynamic
 
 
-class ThreadStub:
-    def __init__(self):
-        self.messages = []
-
+class ThreadStub(CompactingThread):
     def send_message(self, msg):
         # Accept either module Message objects or simple strings/dicts
         try:
             content = msg.content
         except Exception:
             content = str(msg)
-        self.messages.append(type("M", (), {"role": getattr(msg, "role", "agent"), "content": content}))
+        super().send_message(type("M", (), {
+            "role": getattr(msg, "role", "agent"),
+            "agent": getattr(msg, "agent", None),
+            "content": content,
+            "payload": getattr(msg, "payload", None),
+        }))
 
 
 class OrchestratorShim:
     def __init__(self):
         self.thread = None
+        # Model calls go to a canned endpoint; the router accounts tokens per request
+        self.router = ModelRouter(FakeModelEndpoint(reply="CPU is above its threshold; consider scaling up."))
         # Instantiate agents
-        self.anomaly = AnomalyDetectorAgent()
+        self.anomaly = AnomalyDetectorAgent(router=self.router)
         # Use ResourceOptimizer for logic but wrap behavior for simple message creation
         self.optimizer = ResourceOptimizer(dry_run=True)
 
@@ -60,7 +70,10 @@ class OrchestratorShim:
         return self.thread
 
     def sendtoagent(self, thread, agent_name, message_content):
-        print(f"sendtoagent -> {agent_name}: {message_content}")
+        if isinstance(message_content, (bytes, bytearray)):
+            print(f"sendtoagent -> {agent_name}: {len(decode_findings(message_content))} findings")
+        else:
+            print(f"sendtoagent -> {agent_name}: {message_content}")
         # Build a minimal message object expected by agents
         class Msg:
             def __init__(self, content, role="user"):
@@ -76,24 +89,23 @@ class OrchestratorShim:
             except Exception as e:
                 print("Anomaly agent run failed:", e)
         elif agent_name == "optimizer":
-            # Simulate parsing anomaly message and produce an optimization result
-            # We'll look for numeric values in the message and provide a recommendation
-            text = message_content
-            nums = [float(n) for n in re.findall(r"\d+\.?\d*", text)]
-            if nums:
-                val = nums[0]
-                rec = self.optimizer.recommend_action("cpu", val)
-                res = self.optimizer.apply_action(rec)
-                opt_msg = f"🛠️ Optimization: {res.get('message', str(res))}"
+            # The anomaly detector hands over typed findings; act on every one of them
+            if isinstance(message_content, (bytes, bytearray)):
+                lines = []
+                for finding in decode_findings(message_content):
+                    rec = self.optimizer.recommend_action(finding.metric, finding.value)
+                    res = self.optimizer.apply_action(rec)
+                    lines.append(res.get("message", str(res)))
+                opt_msg = "🛠️ Optimization:\n" + "\n".join(lines)
             else:
-                opt_msg = "🛠️ Optimization: no numeric metrics parsed; simulated recommendation"
+                opt_msg = "🛠️ Optimization: no structured findings received; simulated recommendation"
             try:
-                thread.send_message(type("M", (), {"role": "agent", "content": opt_msg}))
+                thread.send_message(type("M", (), {"role": "agent", "agent": agent_name, "content": opt_msg}))
             except Exception as e:
                 print("Failed to send optimizer message:", e)
         elif agent_name == "alert":
             alert_msg = f"ALERT: {message_content}"
-            thread.send_message(type("M", (), {"role": "agent", "content": alert_msg}))
+            thread.send_message(type("M", (), {"role": "agent", "agent": agent_name, "content": alert_msg}))
         else:
             # Unknown agent - echo as agent
             thread.send_message(type("M", (), {"role": "agent", "content": f"{agent_name}: {message_content}"}))
@@ -109,6 +121,9 @@ def run_test():
     print("\nFinal messages:")
     for line in results:
         print(line)
+    print("\nModel token usage:")
+    for (request_id, agent, step), usage in orchestrator.router.usage().items():
+        print(f"{request_id} {agent}/{step}: {usage['prompt_tokens']}+{usage['completion_tokens']} tokens")
 
 
 if __name__ == "__main__":